@@ -94,6 +94,12 @@ class DecimalEncoder(json.JSONEncoder):
             return float(obj)
         return super(DecimalEncoder, self).default(obj)
 
+def as_map(value) -> dict:
+    """event_details/context are native Maps on new items, JSON strings on older ones"""
+    if isinstance(value, str):
+        return json.loads(value)
+    return value or {}
+
 def run_background_processing(event):
     """
     Worker: Downloads matches, calculates stats incrementally, updates DB.
@@ -1144,7 +1150,7 @@ def get_top_events_for_match(puuid: str, match_id: str, limit: int = 15) -> list
         unique_events = []
         
         for event_item in sorted_events:
-            event_details = json.loads(event_item.get('event_details', '{}'))
+            event_details = as_map(event_item.get('event_details'))
             
             fingerprint = (
                 float(event_item.get('timestamp_minutes', 0)),
@@ -1167,7 +1173,7 @@ def get_top_events_for_match(puuid: str, match_id: str, limit: int = 15) -> list
                     'impact_score': int(event_item['impact_score']),
                     'game_state': event_item.get('game_state', 'mid'),
                     'event_details': event_details,
-                    'context': json.loads(event_item.get('context', '{}')),
+                    'context': as_map(event_item.get('context')),
                     'has_summary': False,
                     'summary': None
                 }
@@ -1637,8 +1643,8 @@ def answer_event_question(event): # UNUSED
 
 def build_event_qa_prompt(event_data: dict, question: str, match_context: dict) -> str:
     """Build prompt for event-specific question"""
-    event_details = json.loads(event_data.get('event_details', '{}'))
-    context = json.loads(event_data.get('context', '{}'))
+    event_details = as_map(event_data.get('event_details'))
+    context = as_map(event_data.get('context'))
     
     prompt = f"""MATCH SITUATION at {float(event_data.get('timestamp_minutes', 0)):.1f} minutes:
 ━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
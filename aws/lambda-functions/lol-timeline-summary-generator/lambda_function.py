@@ -10,6 +10,7 @@ import math
 import time
 from datetime import datetime, timedelta
 from typing import Dict, List, Tuple, Optional
+from boto3.dynamodb.types import TypeDeserializer
 
 # AWS clients
 dynamodb = boto3.resource('dynamodb')
@@ -29,6 +30,22 @@ MAX_RETRIES = 5
 INITIAL_BACKOFF = 1.0  # Initial backoff in seconds
 MAX_BACKOFF = 30.0  # Maximum backoff in seconds
 
+_deserializer = TypeDeserializer()
+
+
+def _json_field(value):
+    """
+    event_details/context as a JSON string, whether the item stores them as
+    strings ({'S': ...}) or as native Maps ({'M': ...} or a plain dict)
+    """
+    if isinstance(value, dict):
+        if 'S' in value:
+            return value['S']
+        if 'M' in value:
+            value = _deserializer.deserialize(value)
+        return json.dumps(value, default=lambda o: int(o) if o == o.to_integral_value() else float(o))
+    return value
+
 
 class RobustContextExtractor:
     """Extracts rich metrics with robust JSON parsing"""
@@ -874,9 +891,9 @@ def lambda_handler(event, context):
                     'event_id': event_item.get('event_id', {}).get('S') if isinstance(event_item.get('event_id'), dict) else event_item.get('event_id'),
                     'timestamp_minutes': float(event_item.get('timestamp_minutes', {}).get('N', 0) if isinstance(event_item.get('timestamp_minutes'), dict) else event_item.get('timestamp_minutes', 0)),
                     'event_type': event_item.get('event_type', {}).get('S') if isinstance(event_item.get('event_type'), dict) else event_item.get('event_type'),
-                    'event_details': event_item.get('event_details', {}).get('S') if isinstance(event_item.get('event_details'), dict) else event_item.get('event_details'),
+                    'event_details': _json_field(event_item.get('event_details')),
                     'player_context': event_item.get('player_context', {}).get('S') if isinstance(event_item.get('player_context'), dict) else event_item.get('player_context'),
-                    'context': event_item.get('context', {}).get('S') if isinstance(event_item.get('context'), dict) else event_item.get('context'),
+                    'context': _json_field(event_item.get('context')),
                     'puuid': puuid
                 }
                 
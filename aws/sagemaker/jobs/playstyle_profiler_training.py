@@ -9,6 +9,7 @@ from sklearn.metrics import silhouette_score
 import joblib
 import json
 import os 
+from concurrent.futures import ThreadPoolExecutor, wait
 from typing import Dict, List
 import argparse
 
@@ -526,9 +527,22 @@ class PlaystyleProfiler:
             'feature_importance': self.feature_importance
         }
         
-        joblib.dump(model_artifacts, os.path.join(output_path, "playstyle_profiler.pkl"))
-        
-        with open(os.path.join(output_path, "archetypes.json"), 'w') as f:
+        # Write the pickle and the JSON side by side; compressing the pickle
+        # keeps the SM_MODEL_DIR upload at job teardown small
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            futures = [
+                executor.submit(joblib.dump, model_artifacts,
+                                os.path.join(output_path, "playstyle_profiler.pkl"), compress=3),
+                executor.submit(self._write_archetypes, os.path.join(output_path, "archetypes.json"))
+            ]
+            wait(futures)
+        
+        # Surface any exception raised in the writer threads
+        for future in futures:
+            future.result()
+    
+    def _write_archetypes(self, path: str):
+        with open(path, 'w') as f:
             json.dump(self.archetype_names, f, indent=2, default=lambda x: x.item() if isinstance(x, np.generic) else x)
 
 # SageMaker Training Script
@@ -4,53 +4,170 @@ Converts player aggregates and match features into ML-ready format
 """
 
 import boto3
+from botocore.exceptions import ClientError
 import pandas as pd
 import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+from pyarrow import fs
 from typing import Dict, List
 import time
+import random
 import json
-from io import StringIO
+import orjson
+import uuid
+import re
+import hashlib
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+# Use every core for Arrow's conversion and encoding thread pool
+pa.set_cpu_count(os.cpu_count())
+
+# Column statistics let training-side readers skip row groups
+PARQUET_WRITE_OPTIONS = {
+    'compression': 'zstd',
+    'compression_level': 3,
+    'use_dictionary': True,
+    'write_statistics': True,
+    'data_page_size': 1 << 20
+}
 
 class TrainingDataPreparation:
     """
     Extracts data from Athena and prepares it for SageMaker training
+    
+    Athena results are cached by query hash (on by default). Entries expire
+    after cache_ttl_hours since the Glue ETL overwrites the source tables;
+    refresh_cache re-runs every query and repoints its entry, use_cache=False
+    neither reads nor writes the cache
     """
     
     def __init__(self, database: str = 'lol_coach_db', 
                  s3_output_bucket: str = 'lol-coach-processed-data',
-                 region: str = 'us-west-2'):
+                 region: str = 'us-west-2',
+                 use_cache: bool = True,
+                 refresh_cache: bool = False,
+                 cache_ttl_hours: float = 24):
         self.athena_client = boto3.client('athena', region_name=region)
         self.s3_client = boto3.client('s3', region_name=region)
+        self.s3_fs = fs.S3FileSystem(region=region)
         self.database = database
         self.s3_output_bucket = s3_output_bucket
         self.s3_athena_results = f"s3://{s3_output_bucket}/athena-results/"
+        self.unload_locations = {}
+        self.use_cache = use_cache
+        self.refresh_cache = refresh_cache
+        self.cache_ttl_seconds = cache_ttl_hours * 3600
+        self.cached_executions = set()
+        self.pending_cache_keys = {}
         
     def run_athena_query(self, query: str, wait: bool = True) -> str:
         """
         Executes Athena query and returns execution ID
+        
+        The query is wrapped in an UNLOAD so Athena writes Snappy Parquet
+        instead of CSV
         """
         print(f"Running query: {query[:100]}...")
         
+        cache_key = self._cache_key(query)
+        if self.use_cache and not self.refresh_cache:
+            cached_location = self._get_cached_location(cache_key)
+            if cached_location:
+                print(f"Using cached results from {cached_location}")
+                execution_id = f"cache-{cache_key}"
+                self.unload_locations[execution_id] = cached_location
+                self.cached_executions.add(execution_id)
+                return execution_id
+        
+        unload_location = f"{self.s3_athena_results}unload/{uuid.uuid4()}/"
+        unload_query = f"""
+        UNLOAD ({query}
+        )
+        TO '{unload_location}'
+        WITH (format = 'PARQUET', compression = 'SNAPPY')
+        """
+        
         response = self.athena_client.start_query_execution(
-            QueryString=query,
+            QueryString=unload_query,
             QueryExecutionContext={'Database': self.database},
             ResultConfiguration={'OutputLocation': self.s3_athena_results}
         )
         
         execution_id = response['QueryExecutionId']
+        self.unload_locations[execution_id] = unload_location
+        if self.use_cache:
+            self.pending_cache_keys[execution_id] = cache_key
         
         if wait:
             self._wait_for_query(execution_id)
         
         return execution_id
     
+    def _cache_key(self, query: str) -> str:
+        """
+        Hashes the whitespace-normalized SQL
+        """
+        normalized = re.sub(r'\s+', ' ', query).strip()
+        return hashlib.sha256(normalized.encode('utf-8')).hexdigest()
+    
+    def _get_cached_location(self, cache_key: str):
+        """
+        Returns the UNLOAD location of a previous run of the same query, if
+        one exists and is younger than the cache TTL
+        """
+        try:
+            obj = self.s3_client.get_object(
+                Bucket=self.s3_output_bucket,
+                Key=f"athena-cache/{cache_key}.json"
+            )
+        except ClientError as e:
+            if e.response['Error']['Code'] in ('NoSuchKey', '404'):
+                return None
+            raise
+        
+        entry = json.loads(obj['Body'].read())
+        # Entries written before created_at was recorded count as expired
+        age = time.time() - entry.get('created_at', 0)
+        if age > self.cache_ttl_seconds:
+            print(f"Cached results are {age / 3600:.1f}h old, re-running query")
+            return None
+        
+        return entry['location']
+    
+    def _store_cached_location(self, execution_id: str):
+        """
+        Points the query's cache entry at the results of a successful execution
+        """
+        cache_key = self.pending_cache_keys.pop(execution_id, None)
+        if cache_key is None:
+            return
+        
+        self.s3_client.put_object(
+            Bucket=self.s3_output_bucket,
+            Key=f"athena-cache/{cache_key}.json",
+            Body=json.dumps({
+                'location': self.unload_locations[execution_id],
+                'execution_id': execution_id,
+                'created_at': int(time.time())
+            }),
+            ContentType='application/json'
+        )
+    
     def _wait_for_query(self, execution_id: str, max_wait: int = 18000):
         """
         Waits for Athena query to complete
         """
+        if execution_id in self.cached_executions:
+            return True
+        
         print(f"Waiting for query {execution_id}...")
         
         start_time = time.time()
+        delay = 0.3
         while time.time() - start_time < max_wait:
             response = self.athena_client.get_query_execution(
                 QueryExecutionId=execution_id
@@ -60,12 +177,16 @@ class TrainingDataPreparation:
             
             if status == 'SUCCEEDED':
                 print(f"Query succeeded in {time.time() - start_time:.1f}s")
+                self._store_cached_location(execution_id)
                 return True
             elif status in ['FAILED', 'CANCELLED']:
                 reason = response['QueryExecution']['Status'].get('StateChangeReason', 'Unknown')
                 raise Exception(f"Query failed: {reason}")
             
-            time.sleep(2)
+            # Capped exponential backoff with jitter so concurrent pollers
+            # don't hit the API in lockstep
+            time.sleep(delay * random.uniform(0.9, 1.1))
+            delay = min(delay * 1.25, 5.0)
         
         raise Exception(f"Query timed out after {max_wait}s")
     
@@ -73,95 +194,138 @@ class TrainingDataPreparation:
         """
         Retrieves query results as pandas DataFrame
         """
-        # Get S3 location of results
-        response = self.athena_client.get_query_execution(
-            QueryExecutionId=execution_id
-        )
+        # Parquet files written by the UNLOAD for this execution
+        s3_path = self.unload_locations[execution_id]
         
-        s3_path = response['QueryExecution']['ResultConfiguration']['OutputLocation']
+        table = pq.read_table(s3_path.replace('s3://', ''), filesystem=self.s3_fs)
         
-        # Parse S3 path
-        bucket = s3_path.split('/')[2]
-        key = '/'.join(s3_path.split('/')[3:])
-        
-        # Download results
-        obj = self.s3_client.get_object(Bucket=bucket, Key=key)
-        df = pd.read_csv(StringIO(obj['Body'].read().decode('utf-8')))
+        # Keep Arrow-backed columns so nulls stay native and strings
+        # don't become object columns
+        df = table.to_pandas(types_mapper=pd.ArrowDtype, split_blocks=True, self_destruct=True)
         
         print(f"Retrieved {len(df)} rows")
         return df
     
+    def get_query_schema(self, execution_id: str) -> pa.Schema:
+        """
+        Reads only the Parquet footer of the first result file to get the
+        result schema without downloading the data
+        """
+        location = self.unload_locations[execution_id].replace('s3://', '')
+        
+        files = sorted(
+            info.path for info in self.s3_fs.get_file_info(fs.FileSelector(location))
+            if info.type == fs.FileType.File and not info.base_name.startswith(('_', '.'))
+        )
+        if not files:
+            raise Exception(f"No result files found for query {execution_id}")
+        
+        return pq.read_schema(files[0], filesystem=self.s3_fs)
+    
+    def _validate_query_schema(self, execution_id: str, required_columns: List[str]):
+        """
+        Fails fast if the query results are missing expected columns
+        """
+        schema = self.get_query_schema(execution_id)
+        missing = [col for col in required_columns if col not in schema.names]
+        
+        if missing:
+            raise Exception(f"Query results missing columns: {missing}")
+    
     def prepare_playstyle_profiler_data(self) -> pd.DataFrame:
         """
         Prepares data for playstyle profiler (clustering model)
         
         Extracts player-level aggregates with behavioral features
         """
+        execution_id = self._submit_playstyle_profiler_query()
+        return self._fetch_playstyle_profiler_data(execution_id)
+    
+    def _submit_playstyle_profiler_query(self) -> str:
+        """
+        Starts the playstyle profiler query without waiting for it
+        """
         print("\n" + "="*60)
         print("PREPARING PLAYSTYLE PROFILER TRAINING DATA")
         print("="*60)
         
         query = """
+        WITH mf_agg AS (
+            SELECT
+                game_name,
+                tagline,
+                AVG(outnumbered_kills) as avg_outnumbered_kills,
+                AVG(kills_near_enemy_tower) as avg_kills_near_tower,
+                AVG(solo_kills) as avg_solo_kills,
+                AVG(pick_kills_with_ally) as avg_pick_kills,
+                AVG(time_dead) as avg_time_dead,
+                AVG(longest_time_alive) as avg_longest_alive,
+                AVG(cc_time) as avg_cc_time,
+                AVG(heals_on_teammates) as avg_heals_on_teammates,
+                AVG(shields_on_teammates) as avg_shields_on_teammates,
+                AVG(CASE WHEN position = 'JUNGLE' THEN jungle_cs ELSE 0 END) as avg_jungle_cs,
+                AVG(turret_kills) as avg_turret_kills,
+                AVG(dragon_takedowns) as avg_dragon_takedowns,
+                AVG(herald_takedowns) as avg_herald_takedowns,
+                STDDEV(deaths) as death_variance,
+                STDDEV(cs_per_min) as cs_variance,
+                STDDEV(gold_efficiency) as gold_variance
+            FROM lol_coach_db.match_features_27506b28219d8344deb963a9a729bcfb
+            GROUP BY game_name, tagline
+        )
         SELECT 
-            pa.game_name,
-            pa.tagline,
-            pa.total_games,
-            pa.win_rate,
-            pa.avg_kda,
-            pa.avg_cs_per_min,
-            pa.avg_gpm,
-            pa.avg_dpm,
-            pa.avg_vision_score,
-            pa.avg_kill_participation,
-            pa.avg_early_gold_adv,
-            pa.avg_cs_at_10,
-            pa.avg_team_damage_pct,
-            pa.avg_objective_damage,
-            pa.death_consistency,
-            pa.cs_consistency,
+            COALESCE(pa.game_name, '') as game_name,
+            COALESCE(pa.tagline, '') as tagline,
+            COALESCE(pa.total_games, 0) as total_games,
+            COALESCE(pa.win_rate, 0) as win_rate,
+            COALESCE(pa.avg_kda, 0) as avg_kda,
+            COALESCE(pa.avg_cs_per_min, 0) as avg_cs_per_min,
+            COALESCE(pa.avg_gpm, 0) as avg_gpm,
+            COALESCE(pa.avg_dpm, 0) as avg_dpm,
+            COALESCE(pa.avg_vision_score, 0) as avg_vision_score,
+            COALESCE(pa.avg_kill_participation, 0) as avg_kill_participation,
+            COALESCE(pa.avg_early_gold_adv, 0) as avg_early_gold_adv,
+            COALESCE(pa.avg_cs_at_10, 0) as avg_cs_at_10,
+            COALESCE(pa.avg_team_damage_pct, 0) as avg_team_damage_pct,
+            COALESCE(pa.avg_objective_damage, 0) as avg_objective_damage,
+            COALESCE(pa.death_consistency, 0) as death_consistency,
+            COALESCE(pa.cs_consistency, 0) as cs_consistency,
             
-            AVG(mf.outnumbered_kills) as avg_outnumbered_kills,
-            AVG(mf.kills_near_enemy_tower) as avg_kills_near_tower,
-            AVG(mf.solo_kills) as avg_solo_kills,
-            AVG(mf.pick_kills_with_ally) as avg_pick_kills,
-            AVG(mf.time_dead) as avg_time_dead,
-            AVG(mf.longest_time_alive) as avg_longest_alive,
-            AVG(mf.cc_time) as avg_cc_time,
-            AVG(mf.heals_on_teammates) as avg_heals_on_teammates,
-            AVG(mf.shields_on_teammates) as avg_shields_on_teammates,
-            AVG(CASE WHEN mf.position = 'JUNGLE' THEN mf.jungle_cs ELSE 0 END) as avg_jungle_cs,
-            AVG(mf.turret_kills) as avg_turret_kills,
-            AVG(mf.dragon_takedowns) as avg_dragon_takedowns,
-            AVG(mf.herald_takedowns) as avg_herald_takedowns,
-            STDDEV(mf.deaths) as death_variance,
-            STDDEV(mf.cs_per_min) as cs_variance,
-            STDDEV(mf.gold_efficiency) as gold_variance
+            COALESCE(mf.avg_outnumbered_kills, 0) as avg_outnumbered_kills,
+            COALESCE(mf.avg_kills_near_tower, 0) as avg_kills_near_tower,
+            COALESCE(mf.avg_solo_kills, 0) as avg_solo_kills,
+            COALESCE(mf.avg_pick_kills, 0) as avg_pick_kills,
+            COALESCE(mf.avg_time_dead, 0) as avg_time_dead,
+            COALESCE(mf.avg_longest_alive, 0) as avg_longest_alive,
+            COALESCE(mf.avg_cc_time, 0) as avg_cc_time,
+            COALESCE(mf.avg_heals_on_teammates, 0) as avg_heals_on_teammates,
+            COALESCE(mf.avg_shields_on_teammates, 0) as avg_shields_on_teammates,
+            COALESCE(mf.avg_jungle_cs, 0) as avg_jungle_cs,
+            COALESCE(mf.avg_turret_kills, 0) as avg_turret_kills,
+            COALESCE(mf.avg_dragon_takedowns, 0) as avg_dragon_takedowns,
+            COALESCE(mf.avg_herald_takedowns, 0) as avg_herald_takedowns,
+            COALESCE(mf.death_variance, 0) as death_variance,
+            COALESCE(mf.cs_variance, 0) as cs_variance,
+            COALESCE(mf.gold_variance, 0) as gold_variance
             
         FROM lol_coach_db.player_aggregates pa
-        JOIN lol_coach_db.match_features_27506b28219d8344deb963a9a729bcfb mf 
+        JOIN mf_agg mf 
             ON pa.game_name = mf.game_name 
             AND pa.tagline = mf.tagline
-        WHERE pa.total_games >= 10  -- Minimum gamesavg_time_dead for reliable data
-        GROUP BY 
-            pa.game_name, pa.tagline, pa.total_games, pa.win_rate,
-            pa.avg_kda, pa.avg_cs_per_min, pa.avg_gpm, pa.avg_dpm,
-            pa.avg_vision_score, pa.avg_kill_participation, pa.avg_early_gold_adv,
-            pa.avg_cs_at_10, pa.avg_team_damage_pct, pa.avg_objective_damage,
-            pa.death_consistency, pa.cs_consistency
+        WHERE pa.total_games >= 10  -- Minimum games for reliable data
         """
         
-        execution_id = self.run_athena_query(query)
-        df = self.get_query_results(execution_id)
-        
-        # Fill NaN values
-        id_cols = ['game_name', 'tagline']
-        numeric_cols = [col for col in df.columns if col not in id_cols]
-        
-        # Fill NaNs in numeric columns with 0
-        df[numeric_cols] = df[numeric_cols].fillna(0)
+        return self.run_athena_query(query, wait=False)
+    
+    def _fetch_playstyle_profiler_data(self, execution_id: str) -> pd.DataFrame:
+        """
+        Waits for the playstyle profiler query and loads its results
+        """
+        self._wait_for_query(execution_id)
+        self._validate_query_schema(execution_id, ['game_name', 'tagline', 'total_games', 'win_rate'])
         
-        # Fill NaNs in ID columns with an empty string
-        df[id_cols] = df[id_cols].fillna('')
+        # Nulls are already replaced with COALESCE in the query
+        df = self.get_query_results(execution_id)
         
         print(f"\nDataset summary:")
         print(f"  Players: {len(df):,}")
@@ -178,6 +342,13 @@ class TrainingDataPreparation:
         Extracts teamfight sequences from timeline data
         This is more complex - requires timeline processing
         """
+        execution_id = self._submit_hypothetical_simulator_query()
+        return self._fetch_hypothetical_simulator_data(execution_id)
+    
+    def _submit_hypothetical_simulator_query(self) -> str:
+        """
+        Starts the hypothetical simulator query without waiting for it
+        """
         print("\n" + "="*60)
         print("PREPARING HYPOTHETICAL SIMULATOR TRAINING DATA")
         print("="*60)
@@ -217,7 +388,13 @@ class TrainingDataPreparation:
         WHERE gold_diff IS NOT NULL
         """
         
-        execution_id = self.run_athena_query(query)
+        return self.run_athena_query(query, wait=False)
+    
+    def _fetch_hypothetical_simulator_data(self, execution_id: str) -> pd.DataFrame:
+        """
+        Waits for the hypothetical simulator query and loads its results
+        """
+        self._wait_for_query(execution_id)
         df = self.get_query_results(execution_id)
         
         print(f"\nDataset summary:")
@@ -226,26 +403,110 @@ class TrainingDataPreparation:
         
         return df
     
+    def prepare_hypothetical_simulator_splits(self, test_size: float = 0.2) -> Dict:
+        """
+        Prepares hypothetical simulator train/val files without loading the
+        full result set into memory
+        """
+        execution_id = self._submit_hypothetical_simulator_query()
+        return self._fetch_hypothetical_simulator_splits(execution_id, test_size)
+    
+    def _fetch_hypothetical_simulator_splits(self, execution_id: str,
+                                             test_size: float = 0.2) -> Dict:
+        """
+        Waits for the hypothetical simulator query and streams its results
+        into train/val Parquet files batch by batch
+        """
+        self._wait_for_query(execution_id)
+        self._validate_query_schema(execution_id, ['match_id', 'gold_diff', 'blue_won'])
+        
+        dataset = ds.dataset(
+            self.unload_locations[execution_id].replace('s3://', ''),
+            filesystem=self.s3_fs,
+            format='parquet'
+        )
+        
+        # Row count comes from the Parquet footers, so the mask can be
+        # drawn up front and applied to each batch as it streams past
+        n_total = dataset.count_rows()
+        is_train = np.random.default_rng(42).random(n_total) < (1 - test_size)
+        
+        train_key = "training/teamfight_data_train.parquet"
+        val_key = "training/teamfight_data_val.parquet"
+        
+        print(f"\nStreaming {n_total:,} match states to s3://{self.s3_output_bucket}/training/...")
+        
+        offset = 0
+        blue_wins = 0
+        with pq.ParquetWriter(f"{self.s3_output_bucket}/{train_key}", dataset.schema,
+                              filesystem=self.s3_fs, **PARQUET_WRITE_OPTIONS) as train_writer, \
+             pq.ParquetWriter(f"{self.s3_output_bucket}/{val_key}", dataset.schema,
+                              filesystem=self.s3_fs, **PARQUET_WRITE_OPTIONS) as val_writer:
+            
+            for batch in dataset.to_batches(batch_size=64_000):
+                mask = pa.array(is_train[offset:offset + batch.num_rows])
+                offset += batch.num_rows
+                
+                train_writer.write_batch(batch.filter(mask))
+                val_writer.write_batch(batch.filter(pc.invert(mask)))
+                
+                blue_wins += pc.sum(pc.cast(batch.column('blue_won'), pa.int64())).as_py() or 0
+        
+        train_samples = int(is_train.sum())
+        val_samples = n_total - train_samples
+        
+        print(f"\nDataset summary:")
+        print(f"  Match states: {n_total:,}")
+        print(f"  Blue team win rate: {blue_wins / max(n_total, 1):.1%}")
+        
+        print(f"\nSplit summary:")
+        print(f"  Training set: {train_samples:,} samples")
+        print(f"  Validation set: {val_samples:,} samples")
+        
+        return {
+            'train_path': f"s3://{self.s3_output_bucket}/{train_key}",
+            'val_path': f"s3://{self.s3_output_bucket}/{val_key}",
+            'train_samples': train_samples,
+            'val_samples': val_samples,
+            'features': dataset.schema.names
+        }
+    
     def save_to_s3(self, data, filename: str, format: str = 'parquet'):
         """
         Saves DataFrame or dict to S3 in specified format
+        
+        Data is written straight to S3 without staging a file in /tmp
         """
-        local_path = f"/tmp/{filename}"
         s3_key = f"training/{filename}"
         
+        print(f"\nUploading to s3://{self.s3_output_bucket}/{s3_key}...")
+        
         if format == 'parquet':
-            data.to_parquet(local_path, index=False, compression='snappy')
+            table = pa.Table.from_pandas(data, preserve_index=False)
+            pq.write_table(
+                table,
+                f"{self.s3_output_bucket}/{s3_key}",
+                filesystem=self.s3_fs,
+                row_group_size=128_000,
+                **PARQUET_WRITE_OPTIONS
+            )
         elif format == 'csv':
-            data.to_csv(local_path, index=False)
+            self.s3_client.put_object(
+                Bucket=self.s3_output_bucket,
+                Key=s3_key,
+                Body=data.to_csv(index=False).encode('utf-8'),
+                ContentType='text/csv'
+            )
         elif format == 'json':
-            with open(local_path, 'w') as f:
-                json.dump(data, f, indent=4)
+            self.s3_client.put_object(
+                Bucket=self.s3_output_bucket,
+                Key=s3_key,
+                Body=orjson.dumps(data, option=orjson.OPT_INDENT_2),
+                ContentType='application/json'
+            )
         else:
             raise ValueError(f"Unsupported format: {format}")
         
-        print(f"\nUploading to s3://{self.s3_output_bucket}/{s3_key}...")
-        self.s3_client.upload_file(local_path, self.s3_output_bucket, s3_key)
-        
         s3_path = f"s3://{self.s3_output_bucket}/{s3_key}"
         print(f"Saved to {s3_path}")
         
@@ -255,15 +516,14 @@ class TrainingDataPreparation:
         """
         Splits data into train/validation sets
         """
-        from sklearn.model_selection import train_test_split
+        # Shuffle row positions and slice, rather than copying the whole
+        # frame through train_test_split
+        n = len(df)
+        idx = np.random.default_rng(42).permutation(n)
+        cut = int(n * (1 - test_size))
         
-        # Shuffle and split
-        train_df, val_df = train_test_split(
-            df, 
-            test_size=test_size, 
-            random_state=42,
-            shuffle=True
-        )
+        train_df = df.iloc[idx[:cut]]
+        val_df = df.iloc[idx[cut:]]
         
         print(f"\nSplit summary:")
         print(f"  Training set: {len(train_df):,} samples")
@@ -281,9 +541,34 @@ class TrainingDataPreparation:
         
         results = {}
         
+        # Submit both Athena queries up front so they run concurrently,
+        # then wait on them in parallel
+        jobs = {
+            'playstyle_profiler': (self._submit_playstyle_profiler_query,
+                                   self._fetch_playstyle_profiler_data),
+            'hypothetical_simulator': (self._submit_hypothetical_simulator_query,
+                                       self._fetch_hypothetical_simulator_splits)
+        }
+        
+        execution_ids = {}
+        for name, (submit, _) in jobs.items():
+            try:
+                execution_ids[name] = submit()
+            except Exception as e:
+                print(f"Error submitting {name} query: {e}")
+                results[name] = {'error': str(e)}
+        
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            futures = {
+                name: executor.submit(jobs[name][1], execution_id)
+                for name, execution_id in execution_ids.items()
+            }
+        
         # 1. Prepare playstyle profiler data
         try:
-            profiler_df = self.prepare_playstyle_profiler_data()
+            if 'playstyle_profiler' not in futures:
+                raise Exception(results['playstyle_profiler']['error'])
+            profiler_df = futures['playstyle_profiler'].result()
             
             # Split into train/val
             train_df, val_df = self.create_validation_split(profiler_df, test_size=0.2)
@@ -306,22 +591,10 @@ class TrainingDataPreparation:
         
         # 2. Prepare hypothetical simulator data
         try:
-            simulator_df = self.prepare_hypothetical_simulator_data()
-            
-            # Split into train/val
-            train_df, val_df = self.create_validation_split(simulator_df, test_size=0.2)
-            
-            # Save to S3
-            train_path = self.save_to_s3(train_df, 'teamfight_data_train.parquet')
-            val_path = self.save_to_s3(val_df, 'teamfight_data_val.parquet')
-            
-            results['hypothetical_simulator'] = {
-                'train_path': train_path,
-                'val_path': val_path,
-                'train_samples': len(train_df),
-                'val_samples': len(val_df),
-                'features': list(train_df.columns)
-            }
+            if 'hypothetical_simulator' not in futures:
+                raise Exception(results['hypothetical_simulator']['error'])
+            # Split and saved to S3 while streaming the query results
+            results['hypothetical_simulator'] = futures['hypothetical_simulator'].result()
             
         except Exception as e:
             print(f"Error preparing simulator data: {e}")
@@ -371,6 +644,23 @@ if __name__ == "__main__":
         default='us-east-1',
         help='AWS region'
     )
+    parser.add_argument(
+        '--no-cache',
+        action='store_true',
+        help='Re-run Athena queries and skip the result cache entirely '
+             '(by default results are reused for --cache-ttl-hours)'
+    )
+    parser.add_argument(
+        '--refresh-cache',
+        action='store_true',
+        help='Re-run Athena queries and repoint the cache at the new results'
+    )
+    parser.add_argument(
+        '--cache-ttl-hours',
+        type=float,
+        default=24,
+        help='Age after which cached Athena results are re-queried (default: 24)'
+    )
     parser.add_argument(
         '--model',
         choices=['profiler', 'simulator', 'all'],
@@ -384,7 +674,10 @@ if __name__ == "__main__":
     prep = TrainingDataPreparation(
         database=args.database,
         s3_output_bucket=args.output_bucket,
-        region=args.region
+        region=args.region,
+        use_cache=not args.no_cache,
+        refresh_cache=args.refresh_cache,
+        cache_ttl_hours=args.cache_ttl_hours
     )
     
     # Prepare data
@@ -396,9 +689,6 @@ if __name__ == "__main__":
         prep.save_to_s3(train_df, 'player_features_train.parquet')
         prep.save_to_s3(val_df, 'player_features_val.parquet')
     elif args.model == 'simulator':
-        df = prep.prepare_hypothetical_simulator_data()
-        train_df, val_df = prep.create_validation_split(df)
-        prep.save_to_s3(train_df, 'teamfight_data_train.parquet')
-        prep.save_to_s3(val_df, 'teamfight_data_val.parquet')
+        prep.prepare_hypothetical_simulator_splits()
     
     print("\nDone! Training data is ready for SageMaker.")
\ No newline at end of file
@@ -4,23 +4,105 @@ Combines playstyle profiling + timeline feature
 """
 
 import boto3
+from botocore.config import Config
+from botocore.exceptions import ClientError
 import os
 import json
+import orjson
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from datetime import datetime
 import time
+import threading
+from collections import deque
 import argparse 
+from functools import lru_cache
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
-s3_client = boto3.client('s3')
-stepfunctions = boto3.client('stepfunctions')
-dynamodb = boto3.resource('dynamodb')
+# Pin the region so clients skip region resolution on startup
+AWS_REGION = 'us-west-2'
+BOTO_CONFIG = Config(
+    region_name=AWS_REGION,
+    max_pool_connections=50,
+    retries={'mode': 'adaptive', 'max_attempts': 5}
+)
+
+s3_client = boto3.client('s3', config=BOTO_CONFIG)
+stepfunctions = boto3.client('stepfunctions', config=BOTO_CONFIG)
+dynamodb = boto3.resource('dynamodb', config=BOTO_CONFIG)
 
 # Configuration
-RIOT_API_KEY = os.environ['RIOT_API_KEY']
+RIOT_API_KEY_SECRET_ID = os.environ.get('RIOT_API_KEY_SECRET_ID', 'riot-api-key')
 API_ENDPOINT = 'https://v4ft9564pb.execute-api.us-west-2.amazonaws.com'
 STATE_MACHINE_ARN = 'arn:aws:states:us-west-2:768394660366:stateMachine:lol-timeline-batch-processor'
 S3_BUCKET_RAW = 'lol-training-matches-150k'
 S3_BUCKET_PROCESSED = 'lol-coach-processed-data'
+# Created in this region by deploy_infrastructure.py (prefixed like the other tables)
+PUUID_CACHE_TABLE = 'lol-timeline-riot-puuid-cache'
+DOWNLOAD_WORKERS = 8
+
+class RateLimiter:
+    """
+    Thread-safe sliding-window limiter enforcing several (limit, period)
+    windows at once, so bursts can use the short window's allowance while
+    the long window caps the overall rate
+    """
+    
+    def __init__(self, rates: list):
+        self.rates = rates
+        self.longest_period = max(period for _, period in rates)
+        self.calls = deque()
+        self.lock = threading.Lock()
+    
+    def acquire(self):
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                while self.calls and now - self.calls[0] >= self.longest_period:
+                    self.calls.popleft()
+                
+                # Wait until the oldest call in any full window falls out of it
+                wait = 0.0
+                for limit, period in self.rates:
+                    if len(self.calls) >= limit:
+                        wait = max(wait, self.calls[-limit] + period - now)
+                
+                if wait <= 0:
+                    self.calls.append(now)
+                    return
+            
+            time.sleep(wait)
+
+# Riot allows 20 requests per second and 100 requests per 2 minutes
+riot_rate_limiter = RateLimiter([(20, 1), (100, 120)])
+
+@lru_cache(maxsize=1)
+def get_riot_api_key() -> str:
+    """
+    Returns the Riot API key from the environment, falling back to
+    Secrets Manager; the result is cached for the life of the process
+    """
+    if os.environ.get('RIOT_API_KEY'):
+        return os.environ['RIOT_API_KEY']
+    
+    secrets = boto3.client('secretsmanager', config=BOTO_CONFIG)
+    response = secrets.get_secret_value(SecretId=RIOT_API_KEY_SECRET_ID)
+    return response['SecretString']
+
+def create_session(headers: dict = None) -> requests.Session:
+    """
+    Creates a keep-alive session with a sized connection pool and retries
+    on throttling and transient server errors
+    """
+    session = requests.Session()
+    retry = Retry(total=3, backoff_factor=0.3, status_forcelist=[429, 500, 502, 503, 504])
+    session.mount('https://', HTTPAdapter(pool_connections=4, pool_maxsize=16, max_retries=retry))
+    
+    if headers:
+        session.headers.update(headers)
+    
+    return session
 
 class PlayerProcessor:
     """
@@ -32,6 +114,9 @@ class PlayerProcessor:
         self.tagline = tagline
         self.puuid = None
         self.match_ids = []
+        self.saved_match_ids = []
+        self.riot_session = create_session({'X-Riot-Token': get_riot_api_key()})
+        self.api_session = create_session()
         
     def fetch_riot_data(self, num_games: int = 20):
         """
@@ -40,26 +125,16 @@ class PlayerProcessor:
         print(f"\n=== Fetching Riot Data for {self.game_name}#{self.tagline} ===")
         
         # Get PUUID
-        account_url = f"https://americas.api.riotgames.com/riot/account/v1/accounts/by-riot-id/{self.game_name}/{self.tagline}"
-        headers = {'X-Riot-Token': RIOT_API_KEY}
-        
-        try:
-            response = requests.get(account_url, headers=headers)
-            response.raise_for_status()
-        except requests.exceptions.RequestException as e:
-            print(f"✗ Error fetching PUUID: {e}")
+        if not self._fetch_puuid():
             return False
-            
-        account_data = response.json()
-        self.puuid = account_data['puuid']
-        print(f"✓ Retrieved PUUID: {self.puuid}")
         
         # Get match history
         matches_url = f"https://americas.api.riotgames.com/lol/match/v5/matches/by-puuid/{self.puuid}/ids"
         params = {'start': 0, 'count': num_games, 'type': 'ranked'}
         
         try:
-            response = requests.get(matches_url, headers=headers, params=params)
+            riot_rate_limiter.acquire()
+            response = self.riot_session.get(matches_url, params=params)
             response.raise_for_status()
         except requests.exceptions.RequestException as e:
             print(f"✗ Error fetching match IDs: {e}")
@@ -73,61 +148,112 @@ class PlayerProcessor:
         print(f"✓ Retrieved {len(self.match_ids)} match IDs")
         return True
 
+    def _fetch_puuid(self):
+        """
+        Looks up the player's PUUID, using the DynamoDB cache when possible
+        since PUUIDs never change for a Riot ID
+        """
+        riot_id = f"{self.game_name}#{self.tagline}"
+        cache_table = dynamodb.Table(PUUID_CACHE_TABLE)
+        
+        try:
+            cached = cache_table.get_item(Key={'riot_id': riot_id}).get('Item')
+        except ClientError as e:
+            print(f"⚠ PUUID cache unavailable: {e}")
+            cached = None
+        
+        if cached:
+            self.puuid = cached['puuid']
+            print(f"✓ Retrieved PUUID from cache: {self.puuid}")
+            return True
+        
+        account_url = f"https://americas.api.riotgames.com/riot/account/v1/accounts/by-riot-id/{self.game_name}/{self.tagline}"
+        
+        try:
+            riot_rate_limiter.acquire()
+            response = self.riot_session.get(account_url)
+            response.raise_for_status()
+        except requests.exceptions.RequestException as e:
+            print(f"✗ Error fetching PUUID: {e}")
+            return False
+            
+        account_data = response.json()
+        self.puuid = account_data['puuid']
+        print(f"✓ Retrieved PUUID: {self.puuid}")
+        
+        try:
+            cache_table.put_item(Item={'riot_id': riot_id, 'puuid': self.puuid})
+        except ClientError as e:
+            print(f"⚠ Could not cache PUUID: {e}")
+        
+        return True
+
     def download_and_save_matches(self):
         """
         Downloads match and timeline data, saves to S3
+        
+        Matches are fetched concurrently; the shared rate limiter keeps the
+        combined request rate within Riot's limits
         """
         print(f"\n=== Downloading Match Data ===")
         
-        headers = {'X-Riot-Token': RIOT_API_KEY}
-        player_folder = f"{self.game_name}_{self.tagline}"
-        
         download_count = 0
-        for idx, match_id in enumerate(self.match_ids, 1):
-            print(f"[{idx}/{len(self.match_ids)}] Processing {match_id}...")
+        with ThreadPoolExecutor(max_workers=DOWNLOAD_WORKERS) as executor:
+            futures = {
+                executor.submit(self._download_and_save_match, match_id): match_id
+                for match_id in self.match_ids
+            }
             
-            try:
-                # Download match data
-                match_url = f"https://americas.api.riotgames.com/lol/match/v5/matches/{match_id}"
-                match_response = requests.get(match_url, headers=headers)
-                match_response.raise_for_status()
-                match_data = match_response.json()
+            for idx, future in enumerate(as_completed(futures), 1):
+                match_id = futures[future]
                 
-                # Download timeline data
-                timeline_url = f"https://americas.api.riotgames.com/lol/match/v5/matches/{match_id}/timeline"
-                timeline_response = requests.get(timeline_url, headers=headers)
-                timeline_response.raise_for_status()
-                timeline_data = timeline_response.json()
-                
-                # Save to S3
-                match_key = f"raw-matches/{player_folder}/{match_id}/match-data.json"
-                timeline_key = f"raw-matches/{player_folder}/{match_id}/timeline-data.json"
-                
-                s3_client.put_object(
-                    Bucket=S3_BUCKET_RAW,
-                    Key=match_key,
-                    Body=json.dumps(match_data),
-                    ContentType='application/json'
-                )
-                
-                s3_client.put_object(
-                    Bucket=S3_BUCKET_RAW,
-                    Key=timeline_key,
-                    Body=json.dumps(timeline_data),
-                    ContentType='application/json'
-                )
-                
-                print(f"  ✓ Saved to S3: {match_id}")
-                download_count += 1
-                
-                # Rate limiting
-                time.sleep(1.2)  # Riot API rate limit
-                
-            except Exception as e:
-                print(f"  ✗ Error processing {match_id}: {str(e)}")
-                continue
+                try:
+                    future.result()
+                    print(f"[{idx}/{len(self.match_ids)}] ✓ Saved to S3: {match_id}")
+                    self.saved_match_ids.append(match_id)
+                    download_count += 1
+                except Exception as e:
+                    print(f"[{idx}/{len(self.match_ids)}] ✗ Error processing {match_id}: {str(e)}")
         
         print(f"✓ Downloaded {download_count}/{len(self.match_ids)} matches to S3")
+    
+    def _download_and_save_match(self, match_id: str):
+        """
+        Downloads match and timeline data for a single match and saves to S3
+        """
+        player_folder = f"{self.game_name}_{self.tagline}"
+        
+        # Download match data
+        match_url = f"https://americas.api.riotgames.com/lol/match/v5/matches/{match_id}"
+        riot_rate_limiter.acquire()
+        match_response = self.riot_session.get(match_url)
+        match_response.raise_for_status()
+        match_data = match_response.json()
+        
+        # Download timeline data
+        timeline_url = f"https://americas.api.riotgames.com/lol/match/v5/matches/{match_id}/timeline"
+        riot_rate_limiter.acquire()
+        timeline_response = self.riot_session.get(timeline_url)
+        timeline_response.raise_for_status()
+        timeline_data = timeline_response.json()
+        
+        # Save to S3
+        match_key = f"raw-matches/{player_folder}/{match_id}/match-data.json"
+        timeline_key = f"raw-matches/{player_folder}/{match_id}/timeline-data.json"
+        
+        s3_client.put_object(
+            Bucket=S3_BUCKET_RAW,
+            Key=match_key,
+            Body=orjson.dumps(match_data),
+            ContentType='application/json'
+        )
+        
+        s3_client.put_object(
+            Bucket=S3_BUCKET_RAW,
+            Key=timeline_key,
+            Body=orjson.dumps(timeline_data),
+            ContentType='application/json'
+        )
 
     def run_playstyle_profiler(self):
         """
@@ -143,9 +269,8 @@ class PlayerProcessor:
         """
         print(f"\n=== Triggering Timeline Processing ===")
         
-        # Wait for S3 events to propagate (Lambda triggers)
-        print("Waiting 10 seconds for S3 event processing...")
-        time.sleep(10)
+        # Make sure the uploaded objects are visible before processing starts
+        self._wait_for_raw_objects()
         
         # Trigger Step Functions
         execution_name = f"player_{self.game_name}_{self.tagline}_{int(datetime.utcnow().timestamp())}"
@@ -166,6 +291,37 @@ class PlayerProcessor:
         
         return execution_arn
     
+    def _wait_for_raw_objects(self, timeout: int = 10):
+        """
+        Polls S3 until every saved match's timeline object is visible,
+        giving up after timeout seconds
+        """
+        player_folder = f"{self.game_name}_{self.tagline}"
+        pending = [
+            f"raw-matches/{player_folder}/{match_id}/timeline-data.json"
+            for match_id in self.saved_match_ids
+        ]
+        
+        start_time = time.time()
+        delay = 0.2
+        while pending and time.time() - start_time < timeout:
+            still_pending = []
+            for key in pending:
+                try:
+                    s3_client.head_object(Bucket=S3_BUCKET_RAW, Key=key)
+                except ClientError:
+                    still_pending.append(key)
+            
+            pending = still_pending
+            if pending:
+                time.sleep(delay)
+                delay = min(delay * 2, 2.0)
+        
+        if pending:
+            print(f"⚠ {len(pending)} timeline objects not visible after {timeout}s")
+        else:
+            print("✓ All timeline objects visible in S3")
+    
     def wait_for_timeline_completion(self, execution_arn: str, timeout: int = 600):
         """
         Waits for Step Functions execution to complete
@@ -173,6 +329,7 @@ class PlayerProcessor:
         print(f"\n=== Waiting for Timeline Processing ===")
         
         start_time = time.time()
+        delay = 1.0
         
         while time.time() - start_time < timeout:
             response = stepfunctions.describe_execution(executionArn=execution_arn)
@@ -186,7 +343,10 @@ class PlayerProcessor:
                 return False
             
             print(f"  Status: {status}... (elapsed: {int(time.time() - start_time)}s)")
-            time.sleep(10)
+            
+            # Short jobs are picked up quickly, long ones cost fewer calls
+            time.sleep(delay)
+            delay = min(delay * 1.5, 15.0)
         
         print(f"⚠ Timeout reached after {timeout}s")
         return False
@@ -198,23 +358,35 @@ class PlayerProcessor:
         print(f"\n=== Retrieving Timeline Results ===")
         
         results = []
+        url = f"{API_ENDPOINT}/timeline/events"
         
-        for match_id in self.match_ids:
-            url = f"{API_ENDPOINT}/timeline/events"
-            params = {'match_id': match_id, 'puuid': self.puuid}
-            
-            response = requests.get(url, params=params)
+        # Each match is an independent request, so fetch them all at once
+        with ThreadPoolExecutor(max_workers=10) as executor:
+            futures = {
+                executor.submit(self.api_session.get, url,
+                                params={'match_id': match_id, 'puuid': self.puuid}): match_id
+                for match_id in self.match_ids
+            }
             
-            if response.status_code == 200:
-                data = response.json()
-                print(f"✓ Retrieved {len(data.get('events', []))} events for {match_id}")
-                results.append(data)
-            else:
-                print(f"✗ Failed to retrieve events for {match_id} (Status: {response.status_code})")
+            for future in as_completed(futures):
+                match_id = futures[future]
+                
                 try:
-                    print(f"  Error: {response.json().get('error', 'Unknown')}")
-                except:
-                    pass
+                    response = future.result()
+                except requests.exceptions.RequestException as e:
+                    print(f"✗ Failed to retrieve events for {match_id}: {e}")
+                    continue
+                
+                if response.status_code == 200:
+                    data = response.json()
+                    print(f"✓ Retrieved {len(data.get('events', []))} events for {match_id}")
+                    results.append(data)
+                else:
+                    print(f"✗ Failed to retrieve events for {match_id} (Status: {response.status_code})")
+                    try:
+                        print(f"  Error: {response.json().get('error', 'Unknown')}")
+                    except:
+                        pass
         
         return results
     
@@ -1,17 +1,32 @@
-import json
+import orjson
 import boto3
+from botocore.config import Config
 import pandas as pd
-from typing import List, Dict, Tuple
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pacsv
+import pyarrow.dataset as ds
+from pyarrow import fs
+import pyarrow.parquet as pq
+from typing import Iterable, Iterator, List, Dict, Tuple
+from concurrent.futures import ThreadPoolExecutor, as_completed, wait, FIRST_COMPLETED
 import numpy as np
 import time
-from io import StringIO
+import random
+import bisect
+import heapq
+import operator
 import re
 import os
+import uuid
 
 # ==============================================================================
 # CLASS 1: CRITICAL MOMENT DETECTOR
 # ==============================================================================
 
+# Most critical moments kept per match
+MAX_CRITICAL_MOMENTS = 10
+
 class CriticalMomentDetector:
     """
     Identifies critical moments in matches from timeline data
@@ -25,8 +40,14 @@ class CriticalMomentDetector:
         frames = timeline_data.get('info', {}).get('frames', [])
         processed_timestamps = set()
 
-        for i, frame in enumerate(frames):
-            teamfight = self._detect_teamfight(frame, frames, i)
+        for frame in frames:
+            champion_kills, elite_kills = self._partition_events(frame)
+            
+            # A teamfight is keyed by its first kill, so skip detection when
+            # that timestamp is already taken
+            teamfight = None
+            if champion_kills and champion_kills[0].get('timestamp', 0) not in processed_timestamps:
+                teamfight = self._detect_teamfight(champion_kills)
             if teamfight and teamfight['timestamp'] not in processed_timestamps:
                 critical_moments.append({
                     'type': 'TEAMFIGHT',
@@ -36,7 +57,10 @@ class CriticalMomentDetector:
                 })
                 processed_timestamps.add(teamfight['timestamp'])
             
-            objective_contest = self._detect_objective_contest(frame, frames, i)
+            # Likewise an objective is keyed by one of the elite kills
+            objective_contest = None
+            if any(e.get('timestamp', 0) not in processed_timestamps for e in elite_kills):
+                objective_contest = self._detect_objective_contest(elite_kills, champion_kills)
             if objective_contest and objective_contest['timestamp'] not in processed_timestamps:
                 critical_moments.append({
                     'type': 'OBJECTIVE',
@@ -46,13 +70,22 @@ class CriticalMomentDetector:
                 })
                 processed_timestamps.add(objective_contest['timestamp'])
 
-        critical_moments.sort(key=lambda x: x['impact_score'], reverse=True)
-        return critical_moments[:10]
+        return heapq.nlargest(MAX_CRITICAL_MOMENTS, critical_moments,
+                              key=operator.itemgetter('impact_score'))
 
-    def _detect_teamfight(self, frame: Dict, all_frames: List, frame_idx: int) -> Dict:
-        events = frame.get('events', [])
-        kills = [e for e in events if e.get('type') == 'CHAMPION_KILL']
-        
+    def _partition_events(self, frame: Dict) -> Tuple[List[Dict], List[Dict]]:
+        # Split the frame's events in a single pass for both detectors
+        champion_kills = []
+        elite_kills = []
+        for event in frame.get('events', ()):
+            event_type = event.get('type')
+            if event_type == 'CHAMPION_KILL':
+                champion_kills.append(event)
+            elif event_type == 'ELITE_MONSTER_KILL':
+                elite_kills.append(event)
+        return champion_kills, elite_kills
+
+    def _detect_teamfight(self, kills: List[Dict]) -> Dict:
         if len(kills) < 2: return None
         
         first_kill_time = kills[0].get('timestamp', 0)
@@ -80,27 +113,27 @@ class CriticalMomentDetector:
             'timestamp': first_kill_time, 'timestamp_sec': first_kill_time / 1000.0
         }
 
-    def _detect_objective_contest(self, frame: Dict, all_frames: List, frame_idx: int) -> Dict:
-        events = frame.get('events', [])
-        elite_kills = [e for e in events if e.get('type') == 'ELITE_MONSTER_KILL']
-        
+    def _detect_objective_contest(self, elite_kills: List[Dict], champion_kills: List[Dict]) -> Dict:
         if not elite_kills: return None
         
+        # Sorted once so each elite kill counts nearby kills with two bisects
+        kill_times = sorted(e.get('timestamp', 0) for e in champion_kills)
+        
         for elite_kill in elite_kills:
             monster_type = elite_kill.get('monsterType', '')
             timestamp = elite_kill.get('timestamp', 0)
             
-            kills_nearby = [e for e in events 
-                            if e.get('type') == 'CHAMPION_KILL' 
-                            and abs(e.get('timestamp', 0) - timestamp) < 15000]
+            # Kills strictly within 15s either side of the objective
+            kills_nearby = (bisect.bisect_left(kill_times, timestamp + 15000)
+                            - bisect.bisect_right(kill_times, timestamp - 15000))
             
             impact_multiplier = 2.0 if monster_type == 'BARON_NASHOR' else 1.5
-            impact_score = (30 * impact_multiplier) + (len(kills_nearby) * 10)
+            impact_score = (30 * impact_multiplier) + (kills_nearby * 10)
             
-            if len(kills_nearby) > 0 or monster_type in ['BARON_NASHOR', 'ELDER_DRAGON']:
+            if kills_nearby > 0 or monster_type in ['BARON_NASHOR', 'ELDER_DRAGON']:
                 return {
                     'monster_type': monster_type, 'killer_team': elite_kill.get('killerTeamId'),
-                    'was_contested': len(kills_nearby) > 0, 'nearby_kills': len(kills_nearby),
+                    'was_contested': kills_nearby > 0, 'nearby_kills': kills_nearby,
                     'impact_score': impact_score, 'position': elite_kill.get('position', {}),
                     'timestamp': timestamp, 'timestamp_sec': timestamp / 1000.0
                 }
@@ -122,56 +155,98 @@ class CriticalMomentDetector:
 # CLASS 2: HYPOTHETICAL SIMULATOR
 # ==============================================================================
 
+# Feature vector layout for the teamfight model
+FEATURE_DIM = 50
+GOLD_DIFF, LEVEL_DIFF = 0, 1
+BLUE_ALIVE, RED_ALIVE = 2, 3
+BLUE_SPREAD, RED_SPREAD = 4, 5
+
+# Placeholder slots (alive count, ultimates, summoners, power spikes,
+# objective pressure) never change, so they are baked into a template
+FEATURE_TEMPLATE = np.zeros(FEATURE_DIM, dtype=np.float32)
+FEATURE_TEMPLATE[BLUE_ALIVE:RED_ALIVE + 1] = 5.0
+FEATURE_TEMPLATE[6:14] = [0.6, 0.6, 0.7, 0.7, 1.0, 1.0, 0.5, 0.5]
+
+# participantFrames keys, blue side first; _EMPTY stands in for missing
+# entries without allocating a dict per lookup
+PARTICIPANT_IDS = ('1', '2', '3', '4', '5', '6', '7', '8', '9', '10')
+_EMPTY = {}
+
+# Index pairs (i < j) for a five-player team, computed once
+TEAM_PAIR_I, TEAM_PAIR_J = np.triu_indices(5, k=1)
+
+def _team_spread_kernel(xy: np.ndarray) -> float:
+    """Mean pairwise Euclidean distance between the rows of an (N, 2) array"""
+    if len(xy) == 5:
+        i, j = TEAM_PAIR_I, TEAM_PAIR_J
+    else:
+        i, j = np.triu_indices(len(xy), k=1)
+    d = xy[i] - xy[j]
+    return float(np.sqrt((d * d).sum(axis=1)).mean())
+
 class HypotheticalSimulator:
     def __init__(self):
-        pass
+        # Moments in the same match often snap to the same frame
+        self._feat_cache: Dict[Tuple[str, int], np.ndarray] = {}
         
     def prepare_teamfight_features(self, moment: Dict, match_data: Dict, 
-                                     timeline_data: Dict) -> np.ndarray:
+                                     timeline_data: Dict,
+                                     frame_timestamps: np.ndarray = None,
+                                     match_id: str = None) -> np.ndarray:
         timestamp_ms = moment['timestamp'] * 1000
         frames = timeline_data.get('info', {}).get('frames', [])
         if not frames: return None
+        
+        # Callers processing many moments per match pass the timestamps in
+        if frame_timestamps is None:
+            frame_timestamps = self.get_frame_timestamps(timeline_data)
 
-        frame = min(frames, key=lambda x: abs(x.get('timestamp', 0) - timestamp_ms))
+        frame_idx = self._nearest_frame_index(frame_timestamps, timestamp_ms)
+        cache_key = (match_id, frame_idx)
+        if match_id is not None and cache_key in self._feat_cache:
+            return self._feat_cache[cache_key].copy()
+
+        frame = frames[frame_idx]
         participants = frame.get('participantFrames', {})
         
-        blue_team_ids = [1, 2, 3, 4, 5]
-        red_team_ids = [6, 7, 8, 9, 10]
-        features = []
-        
-        blue_gold = sum([participants.get(str(pid), {}).get('totalGold', 0) for pid in blue_team_ids])
-        red_gold = sum([participants.get(str(pid), {}).get('totalGold', 0) for pid in red_team_ids])
-        features.append((blue_gold - red_gold) / 1000.0)
-        
-        blue_levels = [participants.get(str(pid), {}).get('level', 0) for pid in blue_team_ids]
-        red_levels = [participants.get(str(pid), {}).get('level', 0) for pid in red_team_ids]
-        features.append(sum(blue_levels) - sum(red_levels))
+        # One (10, 4) matrix of [gold, level, x, y]; rows 0-4 are blue, 5-9 red
+        rows = []
+        for pid in PARTICIPANT_IDS:
+            p = participants.get(pid, _EMPTY)
+            pos = p.get('position', _EMPTY)
+            rows.append((p.get('totalGold', 0), p.get('level', 0), pos.get('x', 0), pos.get('y', 0)))
+        arr = np.array(rows, dtype=np.float32)
         
-        features.extend([5.0, 5.0])
+        out = FEATURE_TEMPLATE.copy()
+        out[GOLD_DIFF] = (arr[:5, 0].sum() - arr[5:, 0].sum()) / 1000.0
+        out[LEVEL_DIFF] = arr[:5, 1].sum() - arr[5:, 1].sum()
+        out[BLUE_SPREAD] = self._calculate_team_spread(arr[:5, 2:4]) / 1000.0
+        out[RED_SPREAD] = self._calculate_team_spread(arr[5:, 2:4]) / 1000.0
         
-        blue_positions = [(p.get('position', {}).get('x', 0), p.get('position', {}).get('y', 0)) 
-                          for p in (participants.get(str(pid), {}) for pid in blue_team_ids)]
-        red_positions = [(p.get('position', {}).get('x', 0), p.get('position', {}).get('y', 0)) 
-                         for p in (participants.get(str(pid), {}) for pid in red_team_ids)]
-            
-        features.extend([self._calculate_team_spread(blue_positions) / 1000.0, 
-                         self._calculate_team_spread(red_positions) / 1000.0])
-        
-        features.extend([0.6, 0.6, 0.7, 0.7, 1.0, 1.0, 0.5, 0.5])
-        
-        while len(features) < 50:
-            features.append(0.0)
-        
-        return np.array(features[:50], dtype=np.float32)
+        if match_id is not None:
+            self._feat_cache[cache_key] = out.copy()
+        return out
+
+    def clear_feature_cache(self):
+        self._feat_cache.clear()
+
+    def get_frame_timestamps(self, timeline_data: Dict) -> np.ndarray:
+        frames = timeline_data.get('info', {}).get('frames', [])
+        return np.array([f.get('timestamp', 0) for f in frames], dtype=np.float64)
 
-    def _calculate_team_spread(self, positions: List[Tuple[float, float]]) -> float:
+    def _nearest_frame_index(self, frame_timestamps: np.ndarray, timestamp_ms: float) -> int:
+        # Frames are ordered by timestamp, so binary search replaces a full scan;
+        # ties go to the earlier frame
+        idx = int(np.searchsorted(frame_timestamps, timestamp_ms))
+        if idx > 0 and (idx == len(frame_timestamps) or
+                        timestamp_ms - frame_timestamps[idx - 1] <= frame_timestamps[idx] - timestamp_ms):
+            idx -= 1
+        # Match min()'s choice of the first frame among equal timestamps
+        return int(np.searchsorted(frame_timestamps, frame_timestamps[idx]))
+
+    def _calculate_team_spread(self, positions: np.ndarray) -> float:
         if len(positions) < 2: return 0.0
-        distances = []
-        for i in range(len(positions)):
-            for j in range(i + 1, len(positions)):
-                dist = np.sqrt((positions[i][0] - positions[j][0]) ** 2 + (positions[i][1] - positions[j][1]) ** 2)
-                distances.append(dist)
-        return np.mean(distances) if distances else 0.0
+        return _team_spread_kernel(np.ascontiguousarray(positions, dtype=np.float32))
 
 # ==============================================================================
 # CLASS 3: ATHENA HELPER
@@ -195,6 +270,7 @@ class AthenaQuery:
 
     def wait_for_query(self, execution_id: str, max_wait: int = 120000): # Increased wait time
         start_time = time.time()
+        delay = 0.5
         while time.time() - start_time < max_wait:
             response = self.athena_client.get_query_execution(QueryExecutionId=execution_id)
             status = response['QueryExecution']['Status']['State']
@@ -204,7 +280,9 @@ class AthenaQuery:
             elif status in ['FAILED', 'CANCELLED']:
                 reason = response['QueryExecution']['Status'].get('StateChangeReason', 'Unknown')
                 raise Exception(f"Query failed: {reason}")
-            time.sleep(5) # Poll less frequently
+            # Back off exponentially, with jitter so parallel pollers spread out
+            time.sleep(delay * random.uniform(0.8, 1.2))
+            delay = min(delay * 1.5, 10.0)
         raise Exception(f"Query timed out after {max_wait}s")
 
     def get_query_results(self, execution_id: str) -> pd.DataFrame:
@@ -214,7 +292,34 @@ class AthenaQuery:
         if not match: raise ValueError(f"Could not parse S3 path: {s3_path}")
         bucket, key = match.group(1), match.group(2)
         obj = self.s3_client.get_object(Bucket=bucket, Key=key)
-        return pd.read_csv(StringIO(obj['Body'].read().decode('utf-8')))
+        # Arrow's multi-threaded parser reads the bytes without a str decode
+        return pacsv.read_csv(pa.BufferReader(obj['Body'].read())).to_pandas()
+
+    def run_unload_query(self, query: str) -> Tuple[str, str]:
+        """Runs the query as an UNLOAD to Snappy Parquet; returns (execution_id, location)"""
+        location = f"{self.s3_output.rstrip('/')}/unload/{uuid.uuid4()}/"
+        unload_query = f"""
+        UNLOAD ({query}
+        )
+        TO '{location}'
+        WITH (format = 'PARQUET', compression = 'SNAPPY')
+        """
+        return self.run_query(unload_query), location
+
+    def get_unload_results(self, location: str) -> pd.DataFrame:
+        match = re.match(r"s3://([^/]+)/(.+)", location)
+        if not match: raise ValueError(f"Could not parse S3 path: {location}")
+        bucket, prefix = match.group(1), match.group(2)
+        
+        tables = []
+        paginator = self.s3_client.get_paginator('list_objects_v2')
+        for page in paginator.paginate(Bucket=bucket, Prefix=prefix):
+            for obj in page.get('Contents', []):
+                body = self.s3_client.get_object(Bucket=bucket, Key=obj['Key'])['Body'].read()
+                tables.append(pq.read_table(pa.BufferReader(body)))
+        
+        if not tables: return pd.DataFrame()
+        return pa.concat_tables(tables).to_pandas()
 
     def repair_table(self, table_name: str):
         print(f"Repairing table {table_name}. This may take a few minutes...", flush=True)
@@ -230,6 +335,9 @@ class AthenaQuery:
 # MAIN DRIVER SCRIPT (NEW BATCHING LOGIC)
 # ==============================================================================
 
+# Outcome batches in flight at once; Athena's default quota is 20-25
+ATHENA_MAX_CONCURRENT_QUERIES = 10
+
 def chunk_list(data: List, size: int):
     """Yield successive n-sized chunks from a list."""
     for i in range(0, len(data), size):
@@ -239,76 +347,146 @@ def get_all_timeline_files(bucket: str, prefix: str) -> Dict[str, str]:
     print(f"Step 1: Scanning S3 bucket {bucket} for timeline files...", flush=True)
     s3_paginator = boto3.client('s3').get_paginator('list_objects_v2')
     match_map = {}
-    key_regex = re.compile(r"raw-matches/[^/]+/(NA1_\d+|EUW1_\d+|KR_\d+)/timeline-data\.json")
-    page_count = 0
+    key_regex = re.compile(r"raw-matches/[^/]+/((?:NA1|EUW1|KR)_\d+)/timeline-data\.json")
+    object_count = 0
     file_count = 0
+    last_report = time.monotonic()
 
-    for page in s3_paginator.paginate(Bucket=bucket, Prefix=prefix):
-        page_count += 1
-        if 'Contents' not in page: continue
-        for obj in page['Contents']:
+    for page in s3_paginator.paginate(Bucket=bucket, Prefix=prefix, PaginationConfig={'PageSize': 1000}):
+        contents = page.get('Contents', [])
+        object_count += len(contents)
+        for obj in contents:
             key = obj['Key']
+            # Most keys are match-data files; a substring test rejects them before the regex
+            if not key.endswith('/timeline-data.json'): continue
             match = key_regex.search(key)
             if match:
                 match_id = match.group(1)
                 match_map[match_id] = key
                 file_count += 1
-        if page_count % 100 == 0:
-             print(f"Scanned {page_count * 1000} objects, found {file_count} timelines...", flush=True)
+        if time.monotonic() - last_report >= 10:
+            print(f"Scanned {object_count} objects, found {file_count} timelines...", flush=True)
+            last_report = time.monotonic()
 
     print(f"Step 1 Complete: Found {len(match_map)} timeline files in S3.", flush=True)
     return match_map
 
+def query_outcome_batch(athena: AthenaQuery, batch_match_ids: List[str], match_features_table: str) -> Dict[str, int]:
+    """Looks up blue_won for one batch of match IDs"""
+    match_id_str = ", ".join([f"'{mid}'" for mid in batch_match_ids])
+    
+    query = f"""
+    SELECT 
+        match_id,
+        MAX(CASE WHEN team_id = 100 THEN win ELSE 0 END) as blue_won
+    FROM {match_features_table}
+    WHERE match_id IN ({match_id_str})
+    GROUP BY 1
+    """
+    
+    exec_id, location = athena.run_unload_query(query)
+    athena.wait_for_query(exec_id)
+    results_df = athena.get_unload_results(location)
+    if results_df.empty: return {}
+    return pd.Series(results_df.blue_won.values, index=results_df.match_id).to_dict()
+
 def get_match_outcomes(athena: AthenaQuery, match_ids: List[str], match_features_table: str) -> Dict[str, int]:
     print(f"Step 2: Querying Athena for {len(match_ids)} match outcomes in batches...", flush=True)
     BATCH_SIZE = 10000
     full_outcome_map = {}
-    batch_num = 0
     total_batches = (len(match_ids) // BATCH_SIZE) + 1
     
-    for batch_match_ids in chunk_list(match_ids, BATCH_SIZE):
-        batch_num += 1
-        print(f"  - Processing batch {batch_num}/{total_batches}...", flush=True)
-        match_id_str = ", ".join([f"'{mid}'" for mid in batch_match_ids])
-        
-        query = f"""
-        SELECT 
-            match_id,
-            MAX(CASE WHEN team_id = 100 THEN win ELSE 0 END) as blue_won
-        FROM {match_features_table}
-        WHERE match_id IN ({match_id_str})
-        GROUP BY 1
-        """
-        
-        try:
-            exec_id = athena.run_query(query)
-            athena.wait_for_query(exec_id)
-            results_df = athena.get_query_results(exec_id)
-            batch_map = pd.Series(results_df.blue_won.values, index=results_df.match_id).to_dict()
-            full_outcome_map.update(batch_map)
-        except Exception as e:
-            print(f"  - Error processing batch {batch_num}: {e}", flush=True)
-            continue
+    # Batches run concurrently, kept under Athena's concurrent query quota
+    with ThreadPoolExecutor(max_workers=ATHENA_MAX_CONCURRENT_QUERIES) as executor:
+        futures = {
+            executor.submit(query_outcome_batch, athena, batch_match_ids, match_features_table): batch_num
+            for batch_num, batch_match_ids in enumerate(chunk_list(match_ids, BATCH_SIZE), start=1)
+        }
+        for future in as_completed(futures):
+            batch_num = futures[future]
+            try:
+                full_outcome_map.update(future.result())
+                print(f"  - Finished batch {batch_num}/{total_batches}", flush=True)
+            except Exception as e:
+                print(f"  - Error processing batch {batch_num}: {e}", flush=True)
     
     print(f"Step 2 Complete: Found outcomes for {len(full_outcome_map)} matches.", flush=True)
     return full_outcome_map
 
+def get_match_outcomes_from_parquet(match_features_location: str, match_ids: List[str],
+                                    region: str) -> Dict[str, int]:
+    """
+    Reads blue_won per match straight from the match_features Parquet files,
+    skipping Athena's queueing and planning. Only the three needed columns
+    are fetched and row groups are pruned by the match_id filter.
+    """
+    print(f"Step 2: Scanning {match_features_location} for {len(match_ids)} match outcomes...", flush=True)
+    dataset = ds.dataset(match_features_location.replace("s3://", "", 1), format="parquet",
+                         filesystem=fs.S3FileSystem(region=region))
+    table = dataset.to_table(columns=['match_id', 'team_id', 'win'],
+                             filter=ds.field('match_id').isin(match_ids))
+    
+    # Same as MAX(CASE WHEN team_id = 100 THEN win ELSE 0 END) ... GROUP BY match_id
+    is_blue = pc.fill_null(pc.equal(table['team_id'], 100), False)
+    blue_won = pc.if_else(is_blue, table['win'], pa.scalar(0, table['win'].type))
+    outcomes = (pa.table({'match_id': table['match_id'], 'blue_won': blue_won})
+                .group_by('match_id').aggregate([('blue_won', 'max')]))
+    
+    outcome_map = dict(zip(outcomes['match_id'].to_pylist(), outcomes['blue_won_max'].to_pylist()))
+    print(f"Step 2 Complete: Found outcomes for {len(outcome_map)} matches.", flush=True)
+    return outcome_map
+
+def fetch_timelines(s3_client, bucket: str, work: Iterable[Tuple[str, str, int]],
+                    max_workers: int = 32) -> Iterator[Tuple[str, str, int, object]]:
+    """
+    Downloads the timeline for each (match_id, key, outcome) work item on a
+    thread pool and yields (match_id, key, outcome, body bytes or the
+    exception raised) as each finishes.
+    At most 2 * max_workers downloads are in flight to bound memory.
+    """
+    def download(key):
+        return s3_client.get_object(Bucket=bucket, Key=key)['Body'].read()
+
+    work = iter(work)
+    in_flight = {}
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        while True:
+            for item in work:
+                in_flight[executor.submit(download, item[1])] = item
+                if len(in_flight) >= 2 * max_workers:
+                    break
+            
+            if not in_flight:
+                return
+            
+            done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in done:
+                match_id, key, outcome = in_flight.pop(future)
+                try:
+                    yield match_id, key, outcome, future.result()
+                except Exception as e:
+                    yield match_id, key, outcome, e
+
 # --- NEW FUNCTION TO SAVE BATCHES ---
-def save_batch_to_s3(batch_data: List[Dict], bucket: str, batch_num: int):
-    """Converts a list of row-dictionaries to a DataFrame and saves to S3 as Parquet."""
-    if not batch_data:
+def save_batch_to_s3(features: np.ndarray, match_ids: List[str], outcomes: np.ndarray,
+                     bucket: str, batch_num: int):
+    """Builds an Arrow table straight from the columnar batch and saves it to S3 as Parquet."""
+    if len(match_ids) == 0:
         print(f"Batch {batch_num} is empty. Skipping save.", flush=True)
         return
         
-    print(f"\nSaving batch {batch_num} with {len(batch_data)} samples to S3...", flush=True)
-    df = pd.DataFrame(batch_data)
+    print(f"\nSaving batch {batch_num} with {len(match_ids)} samples to S3...", flush=True)
+    columns = {f'feature_{i}': features[:, i] for i in range(features.shape[1])}
+    columns['match_id'] = match_ids
+    columns['outcome'] = outcomes
+    table = pa.Table.from_pydict(columns)
     
     # Define S3 key for this batch
     s3_key = f"training/batch_output/teamfight_data_batch_{batch_num}.parquet"
     s3_path = f"s3://{bucket}/{s3_key}"
     
     try:
-        df.to_parquet(s3_path, index=False)
+        pq.write_table(table, s3_path, compression='snappy')
         print(f"Successfully saved {s3_key}", flush=True)
     except Exception as e:
         print(f"Error saving batch {batch_num} to S3: {e}", flush=True)
@@ -320,12 +498,14 @@ def process_all_matches(
     simulator: HypotheticalSimulator,
     raw_bucket: str, 
     processed_bucket: str,
-    match_features_table: str
+    match_features_table: str,
+    match_features_location: str = None
 ):
     """
     Main ETL function, now with batch processing to save memory.
     """
-    s3_client = boto3.client('s3')
+    # Enough pooled connections for every download worker
+    s3_client = boto3.client('s3', config=Config(max_pool_connections=32))
     
     # 1. Get all timeline files
     match_map = get_all_timeline_files(bucket=raw_bucket, prefix="raw-matches/")
@@ -335,51 +515,70 @@ def process_all_matches(
         
     # 2. Get outcomes for all found matches
     match_ids_list = list(match_map.keys())
-    outcome_map = get_match_outcomes(athena, match_ids_list, match_features_table)
+    outcome_map = None
+    if match_features_location:
+        try:
+            outcome_map = get_match_outcomes_from_parquet(match_features_location, match_ids_list,
+                                                          athena.athena_client.meta.region_name)
+        except Exception as e:
+            print(f"Warning: Direct Parquet scan failed, falling back to Athena. Error: {e}", flush=True)
+    if outcome_map is None:
+        outcome_map = get_match_outcomes(athena, match_ids_list, match_features_table)
     
-    print(f"Step 3: Processing {len(outcome_map)} matches with known outcomes...", flush=True)
+    # Resolve every lookup up front; only matches with both a timeline and an outcome are processed
+    work = [(match_id, match_map[match_id], outcome)
+            for match_id, outcome in outcome_map.items() if match_id in match_map]
+    
+    print(f"Step 3: Processing {len(work)} matches with known outcomes...", flush=True)
     
     # --- BATCHING LOGIC ---
     BATCH_SIZE = 10000  # Process 10,000 matches before saving
     batch_num = 0
-    training_data_rows = []
     total_processed_count = 0
+    
+    # Column-oriented sample buffer, sized so a full batch of matches can never overflow it
+    feat_buf = np.empty((BATCH_SIZE * MAX_CRITICAL_MOMENTS, FEATURE_DIM), dtype=np.float32)
+    # int64 keeps the outcome column's Parquet type what training reads
+    out_buf = np.empty(BATCH_SIZE * MAX_CRITICAL_MOMENTS, dtype=np.int64)
+    id_buf = []
+    n = 0
     # -----------------------
 
-    for match_id, outcome in outcome_map.items():
-        timeline_key = match_map.get(match_id)
-        if not timeline_key: continue
-            
+    # Downloads overlap on the thread pool; parsing and detection stay here
+    for match_id, timeline_key, outcome, body in fetch_timelines(s3_client, raw_bucket, work):
         try:
-            file_obj = s3_client.get_object(Bucket=raw_bucket, Key=timeline_key)
-            timeline_data = json.loads(file_obj['Body'].read())
+            if isinstance(body, Exception): raise body
+            timeline_data = orjson.loads(body)
         except Exception as e:
             print(f"Warning: Could not load timeline {timeline_key}. Skipping. Error: {e}", flush=True)
             continue
             
         moments = detector.detect_critical_moments(timeline_data)
+        frame_timestamps = simulator.get_frame_timestamps(timeline_data)
         
         for moment in moments:
-            features = simulator.prepare_teamfight_features(moment, {}, timeline_data)
+            features = simulator.prepare_teamfight_features(moment, {}, timeline_data,
+                                                            frame_timestamps, match_id)
             if features is not None:
-                feature_dict = {f'feature_{i}': val for i, val in enumerate(features)}
-                feature_dict['match_id'] = match_id
-                feature_dict['outcome'] = int(outcome)
-                training_data_rows.append(feature_dict)
+                feat_buf[n] = features
+                out_buf[n] = outcome
+                id_buf.append(match_id)
+                n += 1
         
+        simulator.clear_feature_cache()
         total_processed_count += 1
         
         # --- SAVE BATCH AND CLEAR MEMORY ---
         if total_processed_count % BATCH_SIZE == 0:
-            save_batch_to_s3(training_data_rows, processed_bucket, batch_num)
-            training_data_rows.clear() 
+            save_batch_to_s3(feat_buf[:n], id_buf, out_buf[:n], processed_bucket, batch_num)
+            id_buf.clear()
+            n = 0
             batch_num += 1
-            print(f"Processed {total_processed_count}/{len(outcome_map)} matches...", flush=True)
+            print(f"Processed {total_processed_count}/{len(work)} matches...", flush=True)
             
     # --- SAVE THE FINAL BATCH ---
-    if training_data_rows:
-        save_batch_to_s3(training_data_rows, processed_bucket, batch_num)
-        training_data_rows.clear()
+    if n:
+        save_batch_to_s3(feat_buf[:n], id_buf, out_buf[:n], processed_bucket, batch_num)
         
     print(f"Step 4: Finished processing all {total_processed_count} matches.", flush=True)
     print(f"Training data batches saved to s3://{processed_bucket}/training/batch_output/", flush=True)
@@ -390,6 +589,8 @@ if __name__ == "__main__":
     PROCESSED_DATA_BUCKET = 'lol-coach-processed-data'
     ATHENA_DB = 'lol_coach_db'
     MATCH_FEATURES_TABLE = 'match_features' 
+    # Glue ETL output behind MATCH_FEATURES_TABLE, read directly for outcome lookups
+    MATCH_FEATURES_S3 = f"s3://{PROCESSED_DATA_BUCKET}/processed/match_features/"
     ATHENA_RESULTS_S3 = f"s3://{PROCESSED_DATA_BUCKET}/athena-results/"
     AWS_REGION = 'us-west-2'
     
@@ -413,6 +614,7 @@ if __name__ == "__main__":
         simulator=simulator,
         raw_bucket=RAW_DATA_BUCKET,
         processed_bucket=PROCESSED_DATA_BUCKET,
-        match_features_table=MATCH_FEATURES_TABLE
+        match_features_table=MATCH_FEATURES_TABLE,
+        match_features_location=MATCH_FEATURES_S3
     )
     print("Timeline processing job complete.", flush=True)
\ No newline at end of file
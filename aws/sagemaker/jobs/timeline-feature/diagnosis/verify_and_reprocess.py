@@ -3,18 +3,72 @@
 Verifies Lambda deployment and reprocesses matches to get KILL/TEAMFIGHT events
 """
 
+import argparse
+import ast
+import base64
 import boto3
 import json
+import re
 import time
+from pathlib import Path
+from botocore.config import Config
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
-lambda_client = boto3.client('lambda', region_name='us-west-2')
-dynamodb = boto3.resource('dynamodb', region_name='us-west-2')
-s3_client = boto3.client('s3', region_name='us-west-2')
+# Shared by every client: a pool big enough for the concurrent invokes and
+# queries, keep-alive connections, and adaptive retries to absorb throttling
+BOTO_CONFIG = Config(
+    max_pool_connections=64,
+    retries={'mode': 'adaptive', 'max_attempts': 10},
+    tcp_keepalive=True
+)
+
+lambda_client = boto3.client('lambda', region_name='us-west-2', config=BOTO_CONFIG)
+# Low-level client: thread-safe, and returns only the projected attributes
+dynamodb_client = boto3.client('dynamodb', region_name='us-west-2', config=BOTO_CONFIG)
+s3_client = boto3.client('s3', region_name='us-west-2', config=BOTO_CONFIG)
+logs_client = boto3.client('logs', region_name='us-west-2', config=BOTO_CONFIG)
+# The coordinator is invoked synchronously and fans out once per call, so a
+# client-side timeout or retry would dispatch every match twice: wait past
+# its 300s timeout and never retry
+coordinator_client = boto3.client('lambda', region_name='us-west-2', config=Config(
+    read_timeout=330,
+    retries={'total_max_attempts': 1},
+    tcp_keepalive=True
+))
 
 FUNCTION_NAME = 'lol-timeline-event-processor'
+LOG_GROUP = f'/aws/lambda/{FUNCTION_NAME}'
+COORDINATOR_FUNCTION_NAME = 'lol-timeline-reprocess-coordinator'
+
+# The processor logs "Event breakdown: {...}" once per timeline
+BREAKDOWN_RE = re.compile(rb'Event breakdown:\s*(\{[^\n]+\})')
 BUCKET_NAME = 'lol-training-matches-150k'
+EVENTS_TABLE = 'lol-timeline-timeline-events'
+INFRA_CONFIG_PATH = Path(__file__).resolve().parent.parent / 'infrastructure' / 'infrastructure_config.json'
+EVENT_TYPES = ('KILL', 'TEAMFIGHT', 'OBJECTIVE', 'STRUCTURE')
+INVOKE_WORKERS = 16
+
+_executor = None
+
 
-def check_lambda_code():
+def _get_executor(max_workers=INVOKE_WORKERS):
+    """One long-lived pool shared by every phase, sized by the first call"""
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=max_workers)
+    return _executor
+
+
+def _expected_processor_sha256():
+    """CodeSha256 recorded by deploy_lambda_functions.py, if any"""
+    try:
+        with open(INFRA_CONFIG_PATH, 'r') as f:
+            return json.load(f).get('processor_code_sha256')
+    except (OSError, ValueError):
+        return None
+
+
+def check_lambda_code(player_folder='ShadowLeaf_8005'):
     """Check if Lambda has the latest code"""
     
     print("="*60)
@@ -22,15 +76,25 @@ def check_lambda_code():
     print("="*60)
     
     try:
-        response = lambda_client.get_function(FunctionName=FUNCTION_NAME)
+        # Configuration only; get_function would also presign a code download URL
+        function_config = lambda_client.get_function_configuration(FunctionName=FUNCTION_NAME)
         
-        last_modified = response['Configuration']['LastModified']
-        code_size = response['Configuration']['CodeSize']
+        last_modified = function_config['LastModified']
+        code_size = function_config['CodeSize']
         
         print(f"\n✓ Lambda Function: {FUNCTION_NAME}")
         print(f"  Last Modified: {last_modified}")
         print(f"  Code Size: {code_size} bytes")
         
+        # The deploy script records the hash it uploaded; comparing it needs no invoke
+        expected_sha = _expected_processor_sha256()
+        if expected_sha:
+            if function_config['CodeSha256'] == expected_sha:
+                print(f"\n✓ Lambda has the UPDATED code (CodeSha256 matches the last deployment)")
+                return True
+            print(f"\n✗ Lambda has OLD code (CodeSha256 differs from the last deployment)")
+            return False
+        
         # The fixed version should have specific logging
         # Let's test invoke and check logs
         
@@ -39,7 +103,7 @@ def check_lambda_code():
         # Find a test file
         response = s3_client.list_objects_v2(
             Bucket=BUCKET_NAME,
-            Prefix='raw-matches/ShadowLeaf_8005/',
+            Prefix=f'raw-matches/{player_folder}/',
             MaxKeys=1
         )
         
@@ -50,38 +114,29 @@ def check_lambda_code():
                 break
         
         if timeline_key:
-            event = {
-                'Records': [{
-                    's3': {
-                        'bucket': {'name': BUCKET_NAME},
-                        'object': {'key': timeline_key}
-                    }
-                }]
-            }
-            
-            lambda_response = lambda_client.invoke(
-                FunctionName=FUNCTION_NAME,
-                InvocationType='RequestResponse',
-                Payload=json.dumps(event),
-                LogType='Tail'
-            )
+            # The one probe invoke that tails logs
+            lambda_response, _ = _invoke_processor(timeline_key, with_logs=True)
             
             # Check logs for "Event breakdown"
             if 'LogResult' in lambda_response:
-                import base64
-                logs = base64.b64decode(lambda_response['LogResult']).decode('utf-8')
+                # Searched as raw bytes, without decoding or splitting lines
+                logs = base64.b64decode(lambda_response['LogResult'])
+                match = BREAKDOWN_RE.search(logs)
                 
-                if 'Event breakdown' in logs:
+                if match:
                     print(f"\n✓ Lambda has the UPDATED code (includes event breakdown logging)")
-                    print(f"\nLog snippet:")
-                    for line in logs.split('\n'):
-                        if 'Event breakdown' in line or 'Extracted' in line:
-                            print(f"  {line}")
+                    print(f"\nEvent breakdown:")
+                    try:
+                        breakdown = ast.literal_eval(match.group(1).decode('utf-8'))
+                        for event_type, count in breakdown.items():
+                            print(f"  {event_type}: {count}")
+                    except (ValueError, SyntaxError):
+                        print(f"  {match.group(0).decode('utf-8')}")
                     return True
                 else:
                     print(f"\n✗ Lambda has OLD code (missing event breakdown logging)")
                     print(f"\nLogs:")
-                    print(logs)
+                    print(logs.decode('utf-8', errors='replace'))
                     return False
         
         return None
@@ -91,6 +146,37 @@ def check_lambda_code():
         return None
 
 
+def _delete_batch(keys):
+    """One BatchWriteItem of up to 25 deletes, retrying unprocessed items"""
+    requests = [{'DeleteRequest': {'Key': key}} for key in keys]
+    delay = 0.05
+    while requests:
+        response = dynamodb_client.batch_write_item(RequestItems={EVENTS_TABLE: requests})
+        requests = response.get('UnprocessedItems', {}).get(EVENTS_TABLE, [])
+        if requests:
+            time.sleep(delay)
+            delay = min(delay * 2, 2.0)
+    return len(keys)
+
+
+def _query_event_keys(match_id):
+    """Every event key for one match"""
+    # match_id is already known, so only event_id is fetched; the raw
+    # {'S': ...} values go straight into the delete keys without conversion
+    match_key = {'S': match_id}
+    keys = []
+    paginator = dynamodb_client.get_paginator('query')
+    for page in paginator.paginate(
+        TableName=EVENTS_TABLE,
+        IndexName='match-impact-index',
+        KeyConditionExpression='match_id = :match_id',
+        ExpressionAttributeValues={':match_id': match_key},
+        ProjectionExpression='event_id'
+    ):
+        keys.extend({'match_id': match_key, 'event_id': item['event_id']} for item in page.get('Items', []))
+    return keys
+
+
 def clear_old_events(match_ids):
     """Delete old events so we can reprocess"""
     
@@ -98,37 +184,140 @@ def clear_old_events(match_ids):
     print("Clearing Old Events from DynamoDB")
     print(f"{'='*60}")
     
-    events_table = dynamodb.Table('lol-timeline-timeline-events')
-    
     deleted_count = 0
-    for match_id in match_ids:
+    all_keys = []
+    
+    executor = _get_executor()
+    # Matches are independent, so their queries overlap
+    futures = {executor.submit(_query_event_keys, match_id): match_id for match_id in match_ids}
+    for future in as_completed(futures):
         try:
-            # Query events for this match
-            response = events_table.query(
-                IndexName='match-impact-index',
-                KeyConditionExpression='match_id = :match_id',
-                ExpressionAttributeValues={':match_id': match_id}
-            )
-            
-            items = response.get('Items', [])
-            
-            if items:
-                print(f"  Deleting {len(items)} events from {match_id}")
-                
-                with events_table.batch_writer() as batch:
-                    for item in items:
-                        batch.delete_item(Key={
-                            'match_id': item['match_id'],
-                            'event_id': item['event_id']
-                        })
-                        deleted_count += 1
-            
+            keys = future.result()
         except Exception as e:
-            print(f"  ✗ Error deleting events for {match_id}: {e}")
+            print(f"  ✗ Error querying events for {futures[future]}: {e}")
+            continue
+        if keys:
+            print(f"  Deleting {len(keys)} events from {futures[future]}")
+            all_keys.extend(keys)
+    
+    # Keys from different matches share batches, so every request carries 25
+    futures = [executor.submit(_delete_batch, all_keys[i:i + 25])
+               for i in range(0, len(all_keys), 25)]
+    for future in as_completed(futures):
+        try:
+            deleted_count += future.result()
+        except Exception as e:
+            print(f"  ✗ Error deleting events: {e}")
     
     print(f"\n✓ Deleted {deleted_count} old events")
 
 
+def _invoke_processor(timeline_key, with_logs=False, asynchronous=False):
+    """Invoke the processor Lambda on one timeline; payload is None when asynchronous"""
+    event = {
+        'Records': [{
+            's3': {
+                'bucket': {'name': BUCKET_NAME},
+                'object': {'key': timeline_key}
+            }
+        }]
+    }
+    
+    # Tailing logs makes Lambda encode them into every response, so it is opt-in
+    extra = {'LogType': 'Tail'} if with_logs else {}
+    response = lambda_client.invoke(
+        FunctionName=FUNCTION_NAME,
+        InvocationType='Event' if asynchronous else 'RequestResponse',
+        Payload=json.dumps(event),
+        **extra
+    )
+    if asynchronous:
+        return response, None
+    payload = json.loads(response['Payload'].read())
+    return response, payload
+
+
+def _print_failure_logs(match_id, since_ms):
+    """Print the processor's CloudWatch lines for a failed match"""
+    try:
+        response = logs_client.filter_log_events(
+            logGroupName=LOG_GROUP,
+            startTime=since_ms,
+            filterPattern=f'?"{match_id}" ?Error ?Traceback',
+            limit=50
+        )
+        for log_event in response.get('events', []):
+            print(f"    {log_event['message'].strip()}")
+    except Exception as e:
+        print(f"    (could not fetch logs: {e})")
+
+
+def _reprocess_via_coordinator(player_folder, match_ids):
+    """
+    Hand the whole list to the in-region coordinator Lambda, which invokes
+    the processor asynchronously. Returns False if it is not deployed or
+    fails, so the caller dispatches locally.
+    """
+    try:
+        response = coordinator_client.invoke(
+            FunctionName=COORDINATOR_FUNCTION_NAME,
+            InvocationType='RequestResponse',
+            Payload=json.dumps({'match_ids': match_ids, 'player_folder': player_folder})
+        )
+    except coordinator_client.exceptions.ResourceNotFoundException:
+        print(f"⚠ {COORDINATOR_FUNCTION_NAME} is not deployed, invoking from here instead")
+        return False
+    
+    payload = json.loads(response['Payload'].read())
+    
+    # Nothing was queued if the coordinator errored, so fall back to dispatching here
+    if response.get('FunctionError') or payload.get('statusCode') != 200:
+        print(f"⚠ {COORDINATOR_FUNCTION_NAME} failed, invoking from here instead: {payload}")
+        return False
+    
+    body = json.loads(payload.get('body', '{}'))
+    
+    print(f"\n{'='*60}")
+    print("Reprocessing Dispatched!")
+    print(f"{'='*60}")
+    print(f"Queued: {body.get('invoked', 0)} {body.get('invoke_type', 'processors')}")
+    for label in body.get('failed', []):
+        print(f"  ✗ Failed to invoke for {label}")
+    return True
+
+
+def _list_timeline_match_ids(player_folder):
+    """Match IDs with a timeline under the player's folder, from one prefix listing"""
+    paginator = s3_client.get_paginator('list_objects_v2')
+    match_ids = set()
+    for page in paginator.paginate(Bucket=BUCKET_NAME, Prefix=f'raw-matches/{player_folder}/'):
+        for obj in page.get('Contents', []):
+            parts = obj['Key'].split('/')
+            if len(parts) == 4 and parts[3] == 'timeline-data.json':
+                match_ids.add(parts[2])
+    return match_ids
+
+
+def _dispatch_locally(player_folder, match_ids):
+    """Queue an asynchronous processor invoke per match from this machine"""
+    executor = _get_executor()
+    futures = {
+        executor.submit(_invoke_processor,
+                        f"raw-matches/{player_folder}/{match_id}/timeline-data.json",
+                        asynchronous=True): match_id
+        for match_id in match_ids
+    }
+    queued = 0
+    for future in as_completed(futures):
+        try:
+            future.result()
+            queued += 1
+        except Exception as e:
+            print(f"  ✗ Failed to invoke for {futures[future]}: {e}")
+    
+    print(f"Queued: {queued} processors")
+
+
 def reprocess_matches(game_name, tagline, match_ids):
     """Reprocess matches with updated Lambda"""
     
@@ -137,74 +326,135 @@ def reprocess_matches(game_name, tagline, match_ids):
     print(f"{'='*60}")
     
     player_folder = f"{game_name}_{tagline}"
+    started_ms = int(time.time() * 1000)
     
-    success_count = 0
-    event_breakdown = {'KILL': 0, 'TEAMFIGHT': 0, 'OBJECTIVE': 0, 'STRUCTURE': 0}
+    # A missing timeline would only surface as a failed invoke, so skip it up front
+    available = _list_timeline_match_ids(player_folder)
+    missing = [match_id for match_id in match_ids if match_id not in available]
+    for match_id in missing:
+        print(f"  ✗ {match_id}: no timeline-data.json under raw-matches/{player_folder}/, skipping")
+    match_ids = [match_id for match_id in match_ids if match_id in available]
+    if not match_ids:
+        print("No matches left to reprocess")
+        return
     
-    for idx, match_id in enumerate(match_ids, 1):
-        timeline_key = f"raw-matches/{player_folder}/{match_id}/timeline-data.json"
-        
-        print(f"\n[{idx}/{len(match_ids)}] {match_id}")
-        
-        event = {
-            'Records': [{
-                's3': {
-                    'bucket': {'name': BUCKET_NAME},
-                    'object': {'key': timeline_key}
-                }
-            }]
-        }
-        
-        try:
-            response = lambda_client.invoke(
-                FunctionName=FUNCTION_NAME,
-                InvocationType='RequestResponse',
-                Payload=json.dumps(event),
-                LogType='Tail'
-            )
-            
-            payload = json.loads(response['Payload'].read())
-            
-            if payload.get('statusCode') == 200:
-                body = json.loads(payload.get('body', '{}'))
-                results = body.get('results', [])
-                
-                if results:
-                    events_found = results[0].get('events_found', 0)
-                    print(f"  ✓ Extracted {events_found} events")
-                    success_count += 1
-                    
-                    # Check logs for breakdown
-                    if 'LogResult' in response:
-                        import base64
-                        logs = base64.b64decode(response['LogResult']).decode('utf-8')
-                        
-                        for line in logs.split('\n'):
-                            if 'Event breakdown' in line:
-                                print(f"  {line.strip()}")
-                                # Parse breakdown
-                                try:
-                                    breakdown_str = line.split('Event breakdown:')[1].strip()
-                                    breakdown = eval(breakdown_str)
-                                    for event_type, count in breakdown.items():
-                                        event_breakdown[event_type] = event_breakdown.get(event_type, 0) + count
-                                except:
-                                    pass
-            else:
-                print(f"  ✗ Error: {payload}")
-            
-            time.sleep(0.5)
-            
-        except Exception as e:
-            print(f"  ✗ Exception: {e}")
+    if not _reprocess_via_coordinator(player_folder, match_ids):
+        _dispatch_locally(player_folder, match_ids)
+    
+    # Processing is asynchronous either way; DynamoDB shows when it lands
+    event_counts = wait_for_events(match_ids)
     
     print(f"\n{'='*60}")
     print("Reprocessing Complete!")
     print(f"{'='*60}")
-    print(f"Successfully processed: {success_count}/{len(match_ids)}")
-    print(f"\nEvent Breakdown Across All Matches:")
-    for event_type, count in sorted(event_breakdown.items(), key=lambda x: x[1], reverse=True):
-        print(f"  {event_type}: {count}")
+    for match_id in match_ids:
+        if event_counts.get(match_id, 0) > 0:
+            print(f"  ✓ {match_id}: {event_counts[match_id]} events")
+        else:
+            print(f"  ✗ {match_id}: no events")
+            # Logs are only pulled from CloudWatch when something looks wrong
+            _print_failure_logs(match_id, started_ms)
+    
+    processed = sum(1 for match_id in match_ids if event_counts.get(match_id, 0) > 0)
+    print(f"Successfully processed: {processed}/{len(match_ids)}")
+    print(f"Total events extracted: {sum(event_counts.values())}")
+
+
+def _count_events(match_id, event_type=None):
+    """Count a match's events, optionally of one type, without fetching items"""
+    params = {
+        'TableName': EVENTS_TABLE,
+        'IndexName': 'match-impact-index',
+        'KeyConditionExpression': 'match_id = :match_id',
+        'ExpressionAttributeValues': {':match_id': {'S': match_id}},
+        'Select': 'COUNT'
+    }
+    if event_type:
+        params['FilterExpression'] = 'event_type = :event_type'
+        params['ExpressionAttributeValues'][':event_type'] = {'S': event_type}
+    
+    # COUNT still reads at most 1MB per page, so sum across pages
+    paginator = dynamodb_client.get_paginator('query')
+    return sum(page['Count'] for page in paginator.paginate(**params))
+
+
+def wait_for_events(match_ids, max_wait=120):
+    """
+    Poll COUNT queries until every match has events and the same count two
+    rounds running (the processor writes in batches, so the first event
+    doesn't mean the rest have landed), or max_wait seconds pass.
+    Backs off 1s, 2s, 4s... between rounds. Returns counts.
+    """
+    event_counts = {}
+    previous_counts = {}
+    pending = list(match_ids)
+    start_time = time.time()
+    delay = 1
+    
+    print(f"\nWaiting for events from {len(pending)} matches...")
+    while pending:
+        executor = _get_executor()
+        futures = {executor.submit(_count_events, match_id): match_id for match_id in pending}
+        for future in as_completed(futures):
+            try:
+                event_counts[futures[future]] = future.result()
+            except Exception as e:
+                print(f"  ✗ Error querying {futures[future]}: {e}")
+        
+        settled = {
+            match_id for match_id in pending
+            if event_counts.get(match_id, 0) > 0
+            and event_counts[match_id] == previous_counts.get(match_id)
+        }
+        previous_counts.update((match_id, event_counts.get(match_id, 0)) for match_id in pending)
+        pending = [match_id for match_id in pending if match_id not in settled]
+        if not pending or time.time() - start_time + delay > max_wait:
+            break
+        
+        print(f"  {len(match_ids) - len(pending)}/{len(match_ids)} matches settled, checking again in {delay}s")
+        time.sleep(delay)
+        delay = min(delay * 2, 16)
+    
+    return event_counts
+
+
+def wait_for_clear(match_ids, max_wait=10):
+    """Poll until the index shows no events for any match, starting at 0.25s"""
+    pending = list(match_ids)
+    start_time = time.time()
+    delay = 0.25
+    
+    while pending:
+        executor = _get_executor()
+        counts = dict(zip(pending, executor.map(_count_events, pending)))
+        pending = [match_id for match_id in pending if counts[match_id] > 0]
+        if not pending or time.time() - start_time + delay > max_wait:
+            break
+        time.sleep(delay)
+        delay = min(delay * 2, 2)
+    
+    if pending:
+        print(f"⚠ {len(pending)} matches still show old events after {max_wait}s")
+    return not pending
+
+
+def _has_event(match_id, event_type):
+    """True once any event of the type is found for the match"""
+    paginator = dynamodb_client.get_paginator('query')
+    for page in paginator.paginate(
+        TableName=EVENTS_TABLE,
+        IndexName='match-impact-index',
+        KeyConditionExpression='match_id = :match_id',
+        FilterExpression='event_type = :event_type',
+        ExpressionAttributeValues={':match_id': {'S': match_id}, ':event_type': {'S': event_type}},
+        Select='SPECIFIC_ATTRIBUTES',
+        ProjectionExpression='event_id'
+    ):
+        # The filter runs after the read, so a page can be empty while later
+        # pages still match; stop at the first hit instead of reading them all
+        if page.get('Items'):
+            return True
+    return False
 
 
 def verify_new_events(match_ids):
@@ -214,35 +464,37 @@ def verify_new_events(match_ids):
     print("Verifying New Events in DynamoDB")
     print(f"{'='*60}")
     
-    events_table = dynamodb.Table('lol-timeline-timeline-events')
+    found = set()
     
-    event_types = {'KILL': 0, 'TEAMFIGHT': 0, 'OBJECTIVE': 0, 'STRUCTURE': 0}
-    
-    for match_id in match_ids:
+    # One presence check per (match, type); once a type turns up in any
+    # match, the checks for it that have not started yet are cancelled
+    executor = _get_executor()
+    futures = {
+        executor.submit(_has_event, match_id, event_type): (match_id, event_type)
+        for match_id in match_ids
+        for event_type in EVENT_TYPES
+    }
+    for future in as_completed(futures):
+        if future.cancelled():
+            continue
+        match_id, event_type = futures[future]
         try:
-            response = events_table.query(
-                IndexName='match-impact-index',
-                KeyConditionExpression='match_id = :match_id',
-                ExpressionAttributeValues={':match_id': match_id}
-            )
-            
-            items = response.get('Items', [])
-            
-            for item in items:
-                event_type = item.get('event_type')
-                event_types[event_type] = event_types.get(event_type, 0) + 1
-            
+            if future.result() and event_type not in found:
+                found.add(event_type)
+                for other, (_, other_type) in futures.items():
+                    if other_type == event_type:
+                        other.cancel()
         except Exception as e:
-            print(f"  ✗ Error querying {match_id}: {e}")
+            print(f"  ✗ Error querying {match_id} ({event_type}): {e}")
     
     print(f"\nEvent Types in DynamoDB:")
-    for event_type, count in sorted(event_types.items(), key=lambda x: x[1], reverse=True):
-        if count > 0:
-            print(f"  ✓ {event_type}: {count}")
+    for event_type in EVENT_TYPES:
+        if event_type in found:
+            print(f"  ✓ {event_type}: present")
         else:
-            print(f"  ✗ {event_type}: {count} (MISSING!)")
+            print(f"  ✗ {event_type}: MISSING!")
     
-    if event_types['KILL'] > 0 and event_types['TEAMFIGHT'] > 0:
+    if 'KILL' in found and 'TEAMFIGHT' in found:
         print(f"\n✓ SUCCESS! KILL and TEAMFIGHT events are now present!")
         return True
     else:
@@ -250,13 +502,41 @@ def verify_new_events(match_ids):
         return False
 
 
+DEFAULT_MATCH_IDS = [
+    'NA1_5376250054',
+    'NA1_5376358183',
+    'NA1_5380404735',
+    'NA1_5381737611',
+    'NA1_5381745546'
+]
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description='Verify the timeline processor and reprocess matches'
+    )
+    parser.add_argument('--player', default='ShadowLeaf', help='Riot game name')
+    parser.add_argument('--tagline', default='8005', help='Riot tagline')
+    parser.add_argument('--match-ids', nargs='+', help='Match IDs to reprocess')
+    parser.add_argument('--match-ids-file', help='JSON file containing a list of match IDs')
+    parser.add_argument('--concurrency', type=int, default=INVOKE_WORKERS,
+                        help='Concurrent Lambda invokes when dispatching locally')
+    parser.add_argument('--yes', action='store_true',
+                        help='Clear and reprocess without asking for confirmation')
+    return parser.parse_args()
+
+
 def main():
+    args = parse_args()
+    # Size the shared pool before any phase uses it
+    _get_executor(args.concurrency)
+    
     print("="*60)
     print("Timeline Event Type Verification & Reprocessing")
     print("="*60)
     
     # Step 1: Check if Lambda has updated code
-    has_updated_code = check_lambda_code()
+    has_updated_code = check_lambda_code(f"{args.player}_{args.tagline}")
     
     if has_updated_code is False:
         print("\n⚠ Lambda needs to be updated with the latest code")
@@ -264,39 +544,34 @@ def main():
         return
     
     # Step 2: Define matches to reprocess
-    match_ids = [
-        'NA1_5376250054',
-        'NA1_5376358183',
-        'NA1_5380404735',
-        'NA1_5381737611',
-        'NA1_5381745546'
-    ]
+    if args.match_ids_file:
+        with open(args.match_ids_file, 'r') as f:
+            match_ids = json.load(f)
+    else:
+        match_ids = args.match_ids or DEFAULT_MATCH_IDS
     
     print(f"\n{'='*60}")
     print(f"Found {len(match_ids)} matches to reprocess")
     print(f"{'='*60}")
     
-    response = input("\nClear old events and reprocess? (y/n): ")
-    
-    if response.lower() != 'y':
-        print("Aborted")
-        return
+    if not args.yes:
+        response = input("\nClear old events and reprocess? (y/n): ")
+        
+        if response.lower() != 'y':
+            print("Aborted")
+            return
     
     # Step 3: Clear old events
     clear_old_events(match_ids)
     
-    # Step 4: Wait a moment
-    print("\nWaiting 3 seconds...")
-    time.sleep(3)
-    
-    # Step 5: Reprocess matches
-    reprocess_matches('ShadowLeaf', '8005', match_ids)
+    # Step 4: The index is eventually consistent, so confirm the deletes are
+    # visible before new events are counted against it
+    wait_for_clear(match_ids)
     
-    # Step 6: Wait for DynamoDB writes
-    print("\nWaiting 5 seconds for DynamoDB writes...")
-    time.sleep(5)
+    # Step 5: Reprocess matches and wait for their events to land
+    reprocess_matches(args.player, args.tagline, match_ids)
     
-    # Step 7: Verify
+    # Step 6: Verify
     success = verify_new_events(match_ids)
     
     if success:
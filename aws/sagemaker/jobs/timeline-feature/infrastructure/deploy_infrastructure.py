@@ -6,15 +6,23 @@ Run this first before deploying Lambda functions
 
 import boto3
 import json
-import time
+from concurrent.futures import ThreadPoolExecutor
+from botocore.config import Config
 from botocore.exceptions import ClientError
 
+# Shared client config: pooled keep-alive connections and adaptive retries
+BOTO_CONFIG = Config(
+    max_pool_connections=64,
+    retries={'mode': 'adaptive', 'max_attempts': 10},
+    tcp_keepalive=True
+)
+
 # AWS clients
-iam = boto3.client('iam')
-dynamodb = boto3.client('dynamodb')
-s3 = boto3.client('s3')
-sns = boto3.client('sns')
-stepfunctions = boto3.client('stepfunctions')
+iam = boto3.client('iam', config=BOTO_CONFIG)
+dynamodb = boto3.client('dynamodb', config=BOTO_CONFIG)
+s3 = boto3.client('s3', config=BOTO_CONFIG)
+sns = boto3.client('sns', config=BOTO_CONFIG)
+stepfunctions = boto3.client('stepfunctions', config=BOTO_CONFIG)
 
 # Configuration
 AWS_REGION = 'us-west-2'
@@ -82,9 +90,14 @@ def create_iam_roles():
             {
                 "Effect": "Allow",
                 "Action": [
-                    "bedrock:InvokeModel"
+                    "bedrock:InvokeModel",
+                    "bedrock:InvokeModelWithResponseStream"
                 ],
-                "Resource": f"arn:aws:bedrock:{AWS_REGION}::foundation-model/anthropic.claude-3-haiku-20240307-v1:0"
+                "Resource": [
+                    f"arn:aws:bedrock:{AWS_REGION}::foundation-model/anthropic.claude-3-haiku-20240307-v1:0",
+                    # Question embeddings for the semantic Q&A cache
+                    f"arn:aws:bedrock:{AWS_REGION}::foundation-model/amazon.titan-embed-text-v2:0"
+                ]
             },
             {
                 "Effect": "Allow",
@@ -96,30 +109,43 @@ def create_iam_roles():
         ]
     }
     
-    try:
-        lambda_role = iam.create_role(
-            RoleName=lambda_role_name,
-            AssumeRolePolicyDocument=json.dumps(lambda_trust_policy),
-            Description='Execution role for timeline Lambda functions'
-        )
-        print(f"✓ Created Lambda role: {lambda_role_name}")
-        
-        # Attach inline policy
-        iam.put_role_policy(
-            RoleName=lambda_role_name,
-            PolicyName=f'{PROJECT_PREFIX}-lambda-policy',
-            PolicyDocument=json.dumps(lambda_policy)
-        )
-        print(f"✓ Attached Lambda policy")
-        
-        lambda_role_arn = lambda_role['Role']['Arn']
-        
-    except ClientError as e:
-        if e.response['Error']['Code'] == 'EntityAlreadyExists':
-            print(f"⚠ Lambda role already exists: {lambda_role_name}")
-            lambda_role_arn = f"arn:aws:iam::{AWS_ACCOUNT_ID}:role/{lambda_role_name}"
-        else:
-            raise
+    lambda_role_arn = ensure_role(
+        lambda_role_name, lambda_trust_policy, lambda_policy,
+        f'{PROJECT_PREFIX}-lambda-policy', 'Execution role for timeline Lambda functions'
+    )
+    
+    # Reprocess coordinator role: the only function allowed to invoke others,
+    # and only the processor and itself (for the two-level fan-out)
+    coordinator_role_name = f'{PROJECT_PREFIX}-coordinator-role'
+    coordinator_policy = {
+        "Version": "2012-10-17",
+        "Statement": [
+            {
+                "Effect": "Allow",
+                "Action": [
+                    "logs:CreateLogGroup",
+                    "logs:CreateLogStream",
+                    "logs:PutLogEvents"
+                ],
+                "Resource": "arn:aws:logs:*:*:*"
+            },
+            {
+                "Effect": "Allow",
+                "Action": [
+                    "lambda:InvokeFunction"
+                ],
+                "Resource": [
+                    f"arn:aws:lambda:{AWS_REGION}:{AWS_ACCOUNT_ID}:function:{PROJECT_PREFIX}-event-processor",
+                    f"arn:aws:lambda:{AWS_REGION}:{AWS_ACCOUNT_ID}:function:{PROJECT_PREFIX}-reprocess-coordinator"
+                ]
+            }
+        ]
+    }
+    
+    coordinator_role_arn = ensure_role(
+        coordinator_role_name, lambda_trust_policy, coordinator_policy,
+        f'{PROJECT_PREFIX}-coordinator-policy', 'Execution role for the reprocess coordinator Lambda'
+    )
     
     # Step Functions execution role
     sfn_role_name = f'{PROJECT_PREFIX}-stepfunctions-role'
@@ -168,35 +194,44 @@ def create_iam_roles():
         ]
     }
     
+    sfn_role_arn = ensure_role(
+        sfn_role_name, sfn_trust_policy, sfn_policy,
+        f'{PROJECT_PREFIX}-stepfunctions-policy', 'Execution role for Step Functions workflow'
+    )
+    
+    # IAM propagation to Lambda can't be observed here; creating a function
+    # with a brand-new role is retried in deploy_lambda_functions instead
+    return lambda_role_arn, coordinator_role_arn, sfn_role_arn
+
+
+def ensure_role(role_name: str, trust_policy: dict, policy: dict,
+                policy_name: str, description: str) -> str:
+    """
+    Creates the role if needed and (re)writes its inline policy, so narrowed
+    permissions also reach roles created by earlier runs. Returns the role ARN.
+    """
     try:
-        sfn_role = iam.create_role(
-            RoleName=sfn_role_name,
-            AssumeRolePolicyDocument=json.dumps(sfn_trust_policy),
-            Description='Execution role for Step Functions workflow'
-        )
-        print(f"✓ Created Step Functions role: {sfn_role_name}")
-        
-        iam.put_role_policy(
-            RoleName=sfn_role_name,
-            PolicyName=f'{PROJECT_PREFIX}-stepfunctions-policy',
-            PolicyDocument=json.dumps(sfn_policy)
-        )
-        print(f"✓ Attached Step Functions policy")
-        
-        sfn_role_arn = sfn_role['Role']['Arn']
-        
+        role_arn = iam.create_role(
+            RoleName=role_name,
+            AssumeRolePolicyDocument=json.dumps(trust_policy),
+            Description=description
+        )['Role']['Arn']
+        print(f"✓ Created role: {role_name}")
     except ClientError as e:
         if e.response['Error']['Code'] == 'EntityAlreadyExists':
-            print(f"⚠ Step Functions role already exists: {sfn_role_name}")
-            sfn_role_arn = f"arn:aws:iam::{AWS_ACCOUNT_ID}:role/{sfn_role_name}"
+            print(f"⚠ Role already exists: {role_name}")
+            role_arn = f"arn:aws:iam::{AWS_ACCOUNT_ID}:role/{role_name}"
         else:
             raise
     
-    # Wait for roles to propagate
-    print("Waiting for IAM roles to propagate...")
-    time.sleep(10)
+    iam.put_role_policy(
+        RoleName=role_name,
+        PolicyName=policy_name,
+        PolicyDocument=json.dumps(policy)
+    )
+    print(f"✓ Attached policy {policy_name}")
     
-    return lambda_role_arn, sfn_role_arn
+    return role_arn
 
 
 def create_dynamodb_tables():
@@ -210,32 +245,124 @@ def create_dynamodb_tables():
         TIMELINE_EVENTS_TABLE,
         AI_SUMMARIES_CACHE_TABLE,
         USER_QUESTIONS_TABLE,
-        PLAYER_TIMELINE_METADATA_TABLE
+        PLAYER_TIMELINE_METADATA_TABLE,
+        RIOT_PUUID_CACHE_TABLE
     )
     
     tables = [
         TIMELINE_EVENTS_TABLE,
         AI_SUMMARIES_CACHE_TABLE,
         USER_QUESTIONS_TABLE,
-        PLAYER_TIMELINE_METADATA_TABLE
+        PLAYER_TIMELINE_METADATA_TABLE,
+        RIOT_PUUID_CACHE_TABLE
     ]
     
-    for table_config in tables:
+    def create_table(table_config):
         try:
-            table_config['TableName'] = f"{PROJECT_PREFIX}-{table_config['TableName'].replace('lol-', '')}"
-            
             print(f"Creating table: {table_config['TableName']}")
-            dynamodb.create_table(**table_config)
+            response = dynamodb.create_table(**table_config)
             print(f"✓ Table {table_config['TableName']} created")
+            status = response['TableDescription']['TableStatus']
             
         except ClientError as e:
             if e.response['Error']['Code'] == 'ResourceInUseException':
                 print(f"⚠ Table {table_config['TableName']} already exists")
+                status = None
             else:
                 raise
+        return table_config['TableName'], status
+    
+    def wait_for_table(created):
+        table_name, status = created
+        # Skip polling when create_table already reported the table ACTIVE
+        if status != 'ACTIVE':
+            dynamodb.get_waiter('table_exists').wait(
+                TableName=table_name,
+                WaiterConfig={'Delay': 2, 'MaxAttempts': 60}
+            )
+        print(f"✓ Table {table_name} is active")
+        
+        # Existing tables don't pick up indexes added to the schema later
+        if status is None:
+            add_missing_indexes(configs[table_name])
+    
+    for table_config in tables:
+        table_config['TableName'] = f"{PROJECT_PREFIX}-{table_config['TableName'].replace('lol-', '')}"
+    configs = {table_config['TableName']: table_config for table_config in tables}
+    
+    # Tables are created concurrently, then each waiter returns as soon as
+    # its table is ACTIVE instead of sleeping a fixed 30s
+    with ThreadPoolExecutor(max_workers=len(tables)) as executor:
+        created = list(executor.map(create_table, tables))
+        print("Waiting for tables to become active...")
+        list(executor.map(wait_for_table, created))
+
+
+def add_missing_indexes(table_config):
+    """
+    Creates GSIs that are in the schema but not on the existing table
+    """
+    
+    table_name = table_config['TableName']
+    table = dynamodb.describe_table(TableName=table_name)['Table']
+    existing = {index['IndexName'] for index in table.get('GlobalSecondaryIndexes', [])}
+    missing = [
+        index for index in table_config.get('GlobalSecondaryIndexes', [])
+        if index['IndexName'] not in existing
+    ]
+    if not missing:
+        return
+    
+    # DynamoDB builds one new index per table at a time; later ones are
+    # picked up on the next run once this one is ACTIVE
+    index = missing[0]
+    definitions = {a['AttributeName']: a for a in table_config['AttributeDefinitions']}
+    try:
+        dynamodb.update_table(
+            TableName=table_name,
+            AttributeDefinitions=[definitions[k['AttributeName']] for k in index['KeySchema']],
+            GlobalSecondaryIndexUpdates=[{'Create': index}]
+        )
+        print(f"✓ Creating index {index['IndexName']} on {table_name} (backfills in the background)")
+    except ClientError as e:
+        print(f"⚠ Could not add index {index['IndexName']} to {table_name}: {str(e)}")
+    if len(missing) > 1:
+        print(f"⚠ {len(missing) - 1} more index(es) pending on {table_name}; re-run once it is ACTIVE")
+
+
+def backfill_question_event_puuid():
+    """
+    Sets event_puuid on question rows written before the attribute existed,
+    so the event-puuid-index count behind the 5-question limit includes them.
+    Only rows missing it are touched, so re-runs are cheap no-ops.
+    """
+    
+    table_name = f"{PROJECT_PREFIX}-timeline-user-questions"
+    print(f"\n=== Backfilling event_puuid on {table_name} ===")
+    
+    def backfill(item):
+        dynamodb.update_item(
+            TableName=table_name,
+            Key={'question_id': item['question_id']},
+            UpdateExpression='SET event_puuid = :event_puuid',
+            ExpressionAttributeValues={
+                ':event_puuid': {'S': f"{item['event_id']['S']}#{item['puuid']['S']}"}
+            }
+        )
+    
+    paginator = dynamodb.get_paginator('scan')
+    pages = paginator.paginate(
+        TableName=table_name,
+        FilterExpression='attribute_not_exists(event_puuid) AND attribute_exists(event_id) AND attribute_exists(puuid)',
+        ProjectionExpression='question_id, event_id, puuid'
+    )
+    updated = 0
+    with ThreadPoolExecutor(max_workers=16) as executor:
+        for page in pages:
+            list(executor.map(backfill, page['Items']))
+            updated += len(page['Items'])
     
-    print("Waiting for tables to become active...")
-    time.sleep(30)
+    print(f"✓ Backfilled event_puuid on {updated} question(s)")
 
 
 def create_sns_topics():
@@ -288,10 +415,11 @@ def main():
     print("="*60)
     
     # Create IAM roles
-    lambda_role_arn, sfn_role_arn = create_iam_roles()
+    lambda_role_arn, coordinator_role_arn, sfn_role_arn = create_iam_roles()
     
     # Create DynamoDB tables
     create_dynamodb_tables()
+    backfill_question_event_puuid()
     
     # Create SNS topics
     topic_arn = create_sns_topics()
@@ -302,6 +430,7 @@ def main():
     # Save configuration
     config = {
         'lambda_role_arn': lambda_role_arn,
+        'coordinator_role_arn': coordinator_role_arn,
         'stepfunctions_role_arn': sfn_role_arn,
         'sns_topic_arn': topic_arn,
         'region': AWS_REGION,
@@ -317,6 +446,7 @@ def main():
     print("="*60)
     print(f"\nConfiguration saved to: infrastructure_config.json")
     print(f"\nLambda Role ARN: {lambda_role_arn}")
+    print(f"Coordinator Role ARN: {coordinator_role_arn}")
     print(f"Step Functions Role ARN: {sfn_role_arn}")
     print(f"SNS Topic ARN: {topic_arn}")
     print("\nNext steps:")
@@ -2,12 +2,19 @@
 Packages and deploys all Lambda functions for timeline feature
 """
 
+import base64
 import boto3
+import functools
+import hashlib
+import io
 import json
 import zipfile
 import os
 import shutil
 import subprocess
+import time
+from botocore.config import Config
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
 
 # --- Path Configuration ---
@@ -15,133 +22,246 @@ SCRIPT_DIR = Path(__file__).resolve().parent
 PROJECT_ROOT = SCRIPT_DIR.parent
 # ---
 
-lambda_client = boto3.client('lambda')
-apigateway = boto3.client('apigatewayv2')
+# Shared client config: pooled keep-alive connections and adaptive retries,
+# so the concurrent deploys neither queue for connections nor trip throttling
+BOTO_CONFIG = Config(
+    max_pool_connections=64,
+    retries={'mode': 'adaptive', 'max_attempts': 10},
+    tcp_keepalive=True
+)
 
-# Load infrastructure config
-config_path = 'infrastructure_config.json'
-with open(config_path, 'r') as f:
-    config = json.load(f)
+lambda_client = boto3.client('lambda', config=BOTO_CONFIG)
+apigateway = boto3.client('apigatewayv2', config=BOTO_CONFIG)
+s3 = boto3.client('s3', config=BOTO_CONFIG)
+sts = boto3.client('sts', config=BOTO_CONFIG)
 
-LAMBDA_ROLE_ARN = config['lambda_role_arn']
-PROJECT_PREFIX = config['project_prefix']
-AWS_REGION = config['region']
-AWS_ACCOUNT_ID = config['account_id'] 
+# Infrastructure config written by deploy_infrastructure.py
+config_path = SCRIPT_DIR / 'infrastructure_config.json'
 
+# Wheels are downloaded here once and reused by every package
+WHEEL_CACHE_DIR = '/tmp/wheel_cache'
 
-def package_lambda(function_dir: Path, output_zip: Path, requirements: list = None):
+# API Gateway and S3 invoke this alias rather than $LATEST
+LIVE_ALIAS = 'live'
+
+# Env value set later by another script (e.g. the Step Functions ARN)
+ENV_PLACEHOLDER = 'TO_BE_UPDATED'
+
+# Set to a directory to also write each built zip there for inspection
+LAMBDA_PACKAGE_DIR = os.environ.get('LAMBDA_PACKAGE_DIR')
+
+# New functions usually activate in a few seconds, so poll often; attempts
+# scale with the delay to keep the same 5 minute ceiling
+LAMBDA_WAITER_DELAY = int(os.environ.get('LAMBDA_WAITER_DELAY', '1'))
+LAMBDA_WAITER_CONFIG = {'Delay': LAMBDA_WAITER_DELAY, 'MaxAttempts': 300 // LAMBDA_WAITER_DELAY}
+
+
+@functools.lru_cache(maxsize=1)
+def load_config() -> dict:
     """
-    Packages Lambda function code with dependencies
-    
-    MODIFIED: Type hints changed to Path for clarity
+    Reads the infrastructure config on first use; later calls (and the
+    step functions script) share the same dict, so updates are saved together
+    """
+    return json.loads(config_path.read_text())
+
+
+def download_wheels(requirements: list, wheel_dir: str = WHEEL_CACHE_DIR):
+    """
+    Downloads requirements (and their dependencies) into a local wheel dir
+    """
+    print(f"Downloading wheels: {', '.join(requirements)}")
+    subprocess.run([
+        'pip', 'download',
+        '-d', wheel_dir
+    ] + requirements, check=True)
+
+
+def package_lambda(function_dir: Path, requirements: list = None,
+                   wheel_dir: str = None) -> bytes:
+    """
+    Packages Lambda function code with dependencies; returns the zip bytes
     """
     
     print(f"Packaging {function_dir.name}...")
-    temp_dir = f'/tmp/{function_dir.name}_package'
-    if os.path.exists(temp_dir):
-        shutil.rmtree(temp_dir)
-    os.makedirs(temp_dir)
     
-    # Copy function code
-    for file in os.listdir(function_dir):
-        if file.endswith('.py'):
-            # MODIFIED: Use Path objects for copying
-            shutil.copy(function_dir / file, temp_dir)
-    
-    # Install dependencies if specified
+    # Pure-Python functions zip straight from the source directory; only
+    # pip needs a staging dir to install into
+    temp_dir = None
     if requirements:
         print(f"  Installing dependencies: {', '.join(requirements)}")
+        temp_dir = f'/tmp/{function_dir.name}_package'
+        if os.path.exists(temp_dir):
+            shutil.rmtree(temp_dir)
+        os.makedirs(temp_dir)
+        # Install from the pre-downloaded wheels when available so parallel
+        # packagers don't each re-resolve and re-download from the index
+        source = ['--no-index', '--find-links', wheel_dir] if wheel_dir else []
         subprocess.run([
             'pip', 'install',
             '-t', temp_dir,
             '--upgrade'
-        ] + requirements, check=True)
+        ] + source + requirements, check=True)
+    
+    files = [(path.name, path) for path in sorted(function_dir.glob('*.py'))]
+    # Only reached when a spec declares requirements; none currently do
+    if temp_dir:
+        root = Path(temp_dir)
+        files.extend(
+            (path.relative_to(root).as_posix(), path)
+            for path in sorted(root.rglob('*'))
+            if path.is_file()
+        )
     
-    # Create zip file
-    with zipfile.ZipFile(output_zip, 'w', zipfile.ZIP_DEFLATED) as zipf:
-        for root, dirs, files in os.walk(temp_dir):
-            for file in files:
-                file_path = os.path.join(root, file)
-                arcname = os.path.relpath(file_path, temp_dir)
-                zipf.write(file_path, arcname)
+    # Compressing a few KB of source costs more than it saves on upload
+    total_size = sum(path.stat().st_size for _, path in files)
+    compression = zipfile.ZIP_STORED if total_size < 1_000_000 else zipfile.ZIP_DEFLATED
+    
+    # Entries are written in a fixed order with a fixed timestamp so an
+    # unchanged function rebuilds to the same bytes (and the same CodeSha256)
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, 'w', compression) as zipf:
+        for arcname, path in files:
+            info = zipfile.ZipInfo(arcname, date_time=(1980, 1, 1, 0, 0, 0))
+            info.external_attr = 0o644 << 16
+            info.compress_type = compression
+            zipf.writestr(info, path.read_bytes())
+    
+    if temp_dir:
+        shutil.rmtree(temp_dir)
     
-    # Cleanup
-    shutil.rmtree(temp_dir)
+    zip_content = buffer.getvalue()
+    print(f"  ✓ Packaged {function_dir.name} ({len(zip_content):,} bytes)")
     
-    print(f"  ✓ Created {output_zip}")
-    return output_zip
+    if LAMBDA_PACKAGE_DIR:
+        output_zip = Path(LAMBDA_PACKAGE_DIR) / f'{function_dir.name}.zip'
+        output_zip.parent.mkdir(parents=True, exist_ok=True)
+        output_zip.write_bytes(zip_content)
+        print(f"  ✓ Wrote {output_zip}")
+    return zip_content
+
+
+def code_sha256(zip_content: bytes) -> str:
+    """
+    Base64 SHA-256 of a zip, matching the CodeSha256 Lambda reports
+    """
+    return base64.b64encode(hashlib.sha256(zip_content).digest()).decode('utf-8')
 
 
-def deploy_lambda_function(function_name: str, zip_file: Path,
+def deploy_lambda_function(function_name: str, zip_content: bytes,
                            handler: str, memory: int = 512, 
-                           timeout: int = 60, env_vars: dict = None):
+                           timeout: int = 60, env_vars: dict = None,
+                           role_key: str = 'lambda_role_arn'):
     """
     Deploys or updates Lambda function
+    role_key names the infrastructure_config entry holding its execution role
     """
     
     print(f"Deploying Lambda function: {function_name}")
     
-    with open(zip_file, 'rb') as f:
-        zip_content = f.read()
-    
     environment = {'Variables': env_vars} if env_vars else {'Variables': {}}
+    role_arn = load_config().get(role_key)
+    if not role_arn:
+        print(f"  ⚠ {role_key} not in infrastructure_config.json (re-run deploy_infrastructure.py); using lambda_role_arn")
+        role_arn = load_config()['lambda_role_arn']
     
     try:
-        # Try to update existing function
-        lambda_client.update_function_code(
-            FunctionName=function_name,
-            ZipFile=zip_content
-        )
-        print(f"  ✓ Updated function code")
-
-        # Wait for the code update to complete before updating the config
-        print(f"  Waiting for code update to finalize...")
-        code_waiter = lambda_client.get_waiter('function_updated')
-        code_waiter.wait(
-            FunctionName=function_name,
-            WaiterConfig={'Delay': 5, 'MaxAttempts': 60} # Poll every 5s, max 5 mins
-        )
-        print(f"  ✓ Code update complete")
-
-        # Now, update the configuration
-        config_response = lambda_client.update_function_configuration(
-            FunctionName=function_name,
-            Role=LAMBDA_ROLE_ARN,
-            Handler=handler,
-            Runtime='python3.11',
-            Timeout=timeout,
-            MemorySize=memory,
-            Environment=environment
-        )
-        print(f"  ✓ Updated function configuration")
-
-        # Wait for the configuration update to complete
-        print(f"  Waiting for config update to finalize...")
-        config_waiter = lambda_client.get_waiter('function_updated')
-        config_waiter.wait(
-            FunctionName=function_name,
-            WaiterConfig={'Delay': 5, 'MaxAttempts': 60} # Poll every 5s, max 5 mins
-        )
-        print(f"  ✓ Config update complete")
+        # Raises ResourceNotFoundException for a new function
+        current = lambda_client.get_function_configuration(FunctionName=function_name)
         
-        return config_response['FunctionArn']
+        desired = {
+            'Role': role_arn,
+            'Handler': handler,
+            'Runtime': 'python3.11',
+            'Timeout': timeout,
+            'MemorySize': memory,
+            'Environment': environment
+        }
+        current_vars = (current.get('Environment') or {}).get('Variables', {})
+        actual = {key: current.get(key) for key in desired}
+        actual['Environment'] = {'Variables': current_vars}
+        
+        # Values filled in by later deploy steps keep what those steps set,
+        # so re-running this script doesn't reset them and churn the config
+        desired['Environment'] = {'Variables': {
+            key: current_vars.get(key, value) if value == ENV_PLACEHOLDER else value
+            for key, value in environment['Variables'].items()
+        }}
+        
+        code_changed = current['CodeSha256'] != code_sha256(zip_content)
+        changed_keys = [key for key in desired if actual[key] != desired[key]]
+        config_changed = bool(changed_keys)
+        
+        if not code_changed and not config_changed:
+            print(f"  ✓ Code and configuration unchanged, skipping update")
+            try:
+                alias = lambda_client.get_alias(FunctionName=function_name, Name=LIVE_ALIAS)
+                return alias['AliasArn']
+            except lambda_client.exceptions.ResourceNotFoundException:
+                # Deployed before aliases were used; publish once below
+                return publish_live_alias(function_name)
+        
+        if code_changed:
+            lambda_client.update_function_code(
+                FunctionName=function_name,
+                ZipFile=zip_content
+            )
+            print(f"  ✓ Updated function code")
+        else:
+            print(f"  ✓ Code unchanged, skipping upload")
+        
+        if config_changed:
+            # The config update conflicts while the code update is still in
+            # progress; retry it with capped backoff instead of waiting in between
+            delay = 0.5
+            for attempt in range(10):
+                try:
+                    config_response = lambda_client.update_function_configuration(
+                        FunctionName=function_name,
+                        **desired
+                    )
+                    break
+                except lambda_client.exceptions.ResourceConflictException:
+                    if attempt == 9:
+                        raise
+                    print(f"  Code update in progress, retrying config in {delay}s...")
+                    time.sleep(delay)
+                    delay = min(delay * 2, 5)
+            print(f"  ✓ Updated function configuration ({', '.join(changed_keys)})")
+        else:
+            print(f"  ✓ Configuration unchanged, skipping update")
+
+        # Callers invoke through the alias, so moving it to the newly
+        # published version replaces waiting for the update to finalize
+        return publish_live_alias(function_name)
 
     except lambda_client.exceptions.ResourceNotFoundException:
-        # Create new function
-        response = lambda_client.create_function(
-            FunctionName=function_name,
-            Runtime='python3.11',
-            Role=LAMBDA_ROLE_ARN,
-            Handler=handler,
-            Code={'ZipFile': zip_content},
-            Timeout=timeout,
-            MemorySize=memory,
-            Environment=environment,
-            Tags={
-                'Project': 'LOL-Coach',
-                'Component': 'Timeline-Feature'
-            }
-        )
+        # Create new function; a role created moments ago may not be
+        # assumable by Lambda yet, so retry that specific error briefly
+        delay = 1
+        for attempt in range(6):
+            try:
+                response = lambda_client.create_function(
+                    FunctionName=function_name,
+                    Runtime='python3.11',
+                    Role=role_arn,
+                    Handler=handler,
+                    Code={'ZipFile': zip_content},
+                    Timeout=timeout,
+                    MemorySize=memory,
+                    Environment=environment,
+                    Publish=True,
+                    Tags={
+                        'Project': 'LOL-Coach',
+                        'Component': 'Timeline-Feature'
+                    }
+                )
+                break
+            except lambda_client.exceptions.InvalidParameterValueException as e:
+                if 'cannot be assumed' not in str(e) or attempt == 5:
+                    raise
+                print(f"  Role not assumable yet, retrying in {delay}s...")
+                time.sleep(delay)
+                delay *= 2
         print(f"  ✓ Created new function")
 
         # Wait for the new function to become active
@@ -149,86 +269,194 @@ def deploy_lambda_function(function_name: str, zip_file: Path,
         active_waiter = lambda_client.get_waiter('function_active')
         active_waiter.wait(
             FunctionName=function_name,
-            WaiterConfig={'Delay': 5, 'MaxAttempts': 60} # Poll every 5s, max 5 mins
+            WaiterConfig=LAMBDA_WAITER_CONFIG
         )
         print(f"  ✓ Function is active")
         
-        return response['FunctionArn']
+        return point_live_alias(function_name, response['Version'])
 
     except Exception as e:
         print(f"  ✗ Error deploying {function_name}: {str(e)}")
         raise e
 
 
-def deploy_all_lambdas():
+def point_live_alias(function_name: str, version: str) -> str:
     """
-    Deploys all Lambda functions
+    Points the live alias at a published version; returns the alias ARN
     """
-    
-    print("\n=== Deploying Lambda Functions ===\n")
-    
-    deployed_functions = {}
-    
-    # 1. Timeline Event Processor
-    zip_file = package_lambda(
-        PROJECT_ROOT / 'lambda_timeline_processor',
-        PROJECT_ROOT / 'lambda_timeline_processor.zip',
-        requirements=['boto3']
+    try:
+        alias = lambda_client.update_alias(
+            FunctionName=function_name,
+            Name=LIVE_ALIAS,
+            FunctionVersion=version
+        )
+    except lambda_client.exceptions.ResourceNotFoundException:
+        alias = lambda_client.create_alias(
+            FunctionName=function_name,
+            Name=LIVE_ALIAS,
+            FunctionVersion=version
+        )
+    print(f"  ✓ Alias {LIVE_ALIAS} -> version {version}")
+    return alias['AliasArn']
+
+
+def publish_live_alias(function_name: str) -> str:
+    """
+    Publishes $LATEST as a version and points the live alias at it
+    """
+    # Publishing conflicts until pending code/config updates finish, and
+    # returns the version synchronously once they have
+    delay = 0.5
+    for attempt in range(20):
+        try:
+            version = lambda_client.publish_version(FunctionName=function_name)['Version']
+            break
+        except lambda_client.exceptions.ResourceConflictException:
+            if attempt == 19:
+                raise
+            print(f"  Update in progress, retrying publish in {delay}s...")
+            time.sleep(delay)
+            delay = min(delay * 2, 5)
+    return point_live_alias(function_name, version)
+
+
+_caller_identity = None
+
+
+def caller_identity() -> dict:
+    """
+    sts:GetCallerIdentity, fetched once per process
+    """
+    global _caller_identity
+    if _caller_identity is None:
+        identity = sts.get_caller_identity()
+        identity.pop('ResponseMetadata', None)
+        _caller_identity = identity
+    return _caller_identity
+
+
+def save_config():
+    """
+    Writes the in-memory infrastructure config back to disk
+    """
+    with open(config_path, 'w') as f:
+        json.dump(load_config(), f, indent=2)
+
+
+def record_code_sha256(config_key: str, zip_content: bytes):
+    """
+    Saves the zip's SHA-256 in the format Lambda reports as CodeSha256, so
+    diagnosis scripts can confirm the live code without invoking it
+    """
+    load_config()[config_key] = code_sha256(zip_content)
+    save_config()
+    print(f"  ✓ Recorded {config_key} in {config_path}")
+
+
+def _package_and_deploy(spec: dict, wheel_dir: str = None):
+    """
+    Packages one Lambda and deploys it; returns the function ARN and zip bytes
+    """
+    zip_content = package_lambda(
+        PROJECT_ROOT / spec['dir'],
+        requirements=spec.get('requirements'),
+        wheel_dir=wheel_dir
     )
     
     function_arn = deploy_lambda_function(
-        function_name=f'{PROJECT_PREFIX}-event-processor',
-        zip_file=zip_file,
+        function_name=spec['function_name'],
+        zip_content=zip_content,
         handler='lambda_function.lambda_handler',
-        memory=1024,
-        timeout=300,
-        env_vars={
-            'EVENTS_TABLE_NAME': f'{PROJECT_PREFIX}-timeline-events',
-            'METADATA_TABLE_NAME': f'{PROJECT_PREFIX}-player-timeline-metadata'
-        }
+        memory=spec['memory'],
+        timeout=spec['timeout'],
+        env_vars=spec.get('env_vars'),
+        role_key=spec.get('role_key', 'lambda_role_arn')
     )
-    deployed_functions['event_processor'] = function_arn
+    return function_arn, zip_content
+
+
+def deploy_all_lambdas():
+    """
+    Deploys all Lambda functions
+    """
     
-    # 2. Bedrock Summary Generator
-    zip_file = package_lambda(
-        PROJECT_ROOT / 'lambda_bedrock_summary_generator',
-        PROJECT_ROOT / 'lambda_bedrock_summary_generator.zip',
-        requirements=['boto3']
-    )
+    prefix = load_config()['project_prefix']
     
-    function_arn = deploy_lambda_function(
-        function_name=f'{PROJECT_PREFIX}-summary-generator',
-        zip_file=zip_file,
-        handler='lambda_function.lambda_handler',
-        memory=512,
-        timeout=120
-    )
-    deployed_functions['summary_generator'] = function_arn
+    print("\n=== Deploying Lambda Functions ===\n")
     
-    # 3. API Handler
-    zip_file = package_lambda(
-        PROJECT_ROOT / 'lambda_api_timeline_handler',
-        PROJECT_ROOT / 'lambda_api_handler.zip',
-        requirements=['boto3']
-    )
+    # boto3 ships with the python3.11 runtime; add 'requirements' to a spec
+    # only for dependencies the runtime doesn't provide
+    lambda_specs = {
+        # 1. Timeline Event Processor
+        'event_processor': {
+            'dir': 'lambda_timeline_processor',
+            'function_name': f'{prefix}-event-processor',
+            'memory': 1024,
+            'timeout': 300,
+            'env_vars': {
+                'EVENTS_TABLE_NAME': f'{prefix}-timeline-events',
+                'METADATA_TABLE_NAME': f'{prefix}-player-timeline-metadata'
+            }
+        },
+        # 2. Bedrock Summary Generator
+        'summary_generator': {
+            'dir': 'lambda_bedrock_summary_generator',
+            'function_name': f'{prefix}-summary-generator',
+            'memory': 512,
+            'timeout': 120
+        },
+        # 3. API Handler
+        'api_handler': {
+            'dir': 'lambda_api_timeline_handler',
+            'function_name': f'{prefix}-api-handler',
+            'memory': 512,
+            'timeout': 30,
+            'env_vars': {
+                'STEP_FUNCTIONS_ARN': ENV_PLACEHOLDER,
+                'EVENTS_TABLE_NAME': f'{prefix}-timeline-events',
+                'METADATA_TABLE_NAME': f'{prefix}-player-timeline-metadata',
+                'SUMMARIES_TABLE_NAME': f'{prefix}-timeline-ai-summaries',
+                'QUESTIONS_TABLE_NAME': f'{prefix}-timeline-user-questions'
+            }
+        },
+        # 4. Reprocess Coordinator
+        'reprocess_coordinator': {
+            'dir': 'lambda_reprocess_coordinator',
+            'function_name': f'{prefix}-reprocess-coordinator',
+            'memory': 512,
+            'timeout': 300,
+            # Own role: the only function allowed to invoke other functions
+            'role_key': 'coordinator_role_arn',
+            'env_vars': {
+                'PROCESSOR_FUNCTION_NAME': f'{prefix}-event-processor',
+                'BUCKET_NAME': 'lol-training-matches-150k'
+            }
+        }
+    }
     
-    function_arn = deploy_lambda_function(
-        function_name=f'{PROJECT_PREFIX}-api-handler',
-        zip_file=zip_file,
-        handler='lambda_function.lambda_handler',
-        memory=512,
-        timeout=30,
-        env_vars={
-            'STEP_FUNCTIONS_ARN': 'TO_BE_UPDATED',
-            'EVENTS_TABLE_NAME': f'{PROJECT_PREFIX}-timeline-events',
-            'METADATA_TABLE_NAME': f'{PROJECT_PREFIX}-player-timeline-metadata',
-            'SUMMARIES_TABLE_NAME': f'{PROJECT_PREFIX}-timeline-ai-summaries',
-            'QUESTIONS_TABLE_NAME': f'{PROJECT_PREFIX}-timeline-user-questions'
+    # Resolve and download shared dependencies once, before the packagers fan out
+    requirements = sorted({req for spec in lambda_specs.values() for req in spec.get('requirements') or []})
+    wheel_dir = None
+    if requirements:
+        download_wheels(requirements)
+        wheel_dir = WHEEL_CACHE_DIR
+    
+    # Each deploy is dominated by uploads and waiter polls, so run them side
+    # by side; the shared client is thread-safe for these calls
+    deployed_functions = {}
+    packages = {}
+    with ThreadPoolExecutor(max_workers=len(lambda_specs)) as executor:
+        futures = {
+            executor.submit(_package_and_deploy, spec, wheel_dir): name
+            for name, spec in lambda_specs.items()
         }
-    )
-    deployed_functions['api_handler'] = function_arn
+        for future in as_completed(futures):
+            deployed_functions[futures[future]], packages[futures[future]] = future.result()
+    
+    # Written after the pool so only one thread touches the config file
+    record_code_sha256('processor_code_sha256', packages['event_processor'])
     
-    return deployed_functions
+    return {name: deployed_functions[name] for name in lambda_specs}
 
 
 def create_api_gateway(api_handler_arn: str):
@@ -236,9 +464,12 @@ def create_api_gateway(api_handler_arn: str):
     Creates HTTP API Gateway for timeline endpoints
     """
     
+    config = load_config()
+    prefix = config['project_prefix']
+    
     print("\n=== Creating API Gateway ===\n")
     
-    api_name = f'{PROJECT_PREFIX}-api'
+    api_name = f'{prefix}-api'
     
     # Create API
     try:
@@ -257,10 +488,20 @@ def create_api_gateway(api_handler_arn: str):
         print(f"✓ Created API: {api_name}")
         print(f"  API ID: {api_id}")
         
+        # Remembered so re-runs don't have to search the account's APIs
+        config['api_id'] = api_id
+        save_config()
+        
     except apigateway.exceptions.ConflictException:
-        # API already exists, get its ID
-        apis = apigateway.get_apis()
-        api_id = next((a['ApiId'] for a in apis['Items'] if a['Name'] == api_name), None)
+        # API already exists; use the recorded ID, searching only if it's missing
+        api_id = config.get('api_id')
+        if not api_id:
+            apis = (
+                item
+                for page in apigateway.get_paginator('get_apis').paginate()
+                for item in page['Items']
+            )
+            api_id = next((a['ApiId'] for a in apis if a['Name'] == api_name), None)
         print(f"⚠ API already exists: {api_name}")
     
     # Create Lambda integration
@@ -282,16 +523,23 @@ def create_api_gateway(api_handler_arn: str):
         ('POST', '/timeline/batch-process')
     ]
     
-    for method, path in routes:
-        try:
-            route = apigateway.create_route(
+    # Routes are independent, so create them concurrently
+    with ThreadPoolExecutor(max_workers=len(routes)) as executor:
+        futures = {
+            executor.submit(
+                apigateway.create_route,
                 ApiId=api_id,
                 RouteKey=f'{method} {path}',
                 Target=f'integrations/{integration_id}'
-            )
-            print(f"  ✓ Created route: {method} {path}")
-        except Exception as e:
-            print(f"  ⚠ Route may already exist: {method} {path}")
+            ): f'{method} {path}'
+            for method, path in routes
+        }
+        for future in as_completed(futures):
+            try:
+                future.result()
+                print(f"  ✓ Created route: {futures[future]}")
+            except Exception as e:
+                print(f"  ⚠ Route may already exist: {futures[future]}")
     
     # Create default stage
     try:
@@ -305,34 +553,23 @@ def create_api_gateway(api_handler_arn: str):
         print(f"⚠ Stage may already exist")
     
     # Get API endpoint
-    api_endpoint = f"https://{api_id}.execute-api.{AWS_REGION}.amazonaws.com"
+    api_endpoint = f"https://{api_id}.execute-api.{config['region']}.amazonaws.com"
     print(f"\n✓ API Gateway endpoint: {api_endpoint}")
     
-    # Grant API Gateway permission to invoke Lambda
-    try:
-        lambda_client.remove_permission(
-            FunctionName=f'{PROJECT_PREFIX}-api-handler',
-            StatementId='AllowAPIGatewayInvoke'
-        )
-        print(f"✓ Removed old/stale API Gateway permission")
-    except lambda_client.exceptions.ResourceNotFoundException:
-        # This is fine, it just means no permission existed
-        print(f"  No old permission found, skipping removal.")
-    except Exception as e:
-        print(f"⚠ Warning: Could not remove old permission: {str(e)}")
-    
-    # Now, add the new, correct permission
+    # Grant API Gateway permission to invoke Lambda; the statement is keyed
+    # by API ID, so a re-run hits the conflict and a new API gets its own
     try:
         lambda_client.add_permission(
-            FunctionName=f'{PROJECT_PREFIX}-api-handler',
-            StatementId='AllowAPIGatewayInvoke',
+            FunctionName=f'{prefix}-api-handler',
+            Qualifier=LIVE_ALIAS,
+            StatementId=f'AllowAPIGatewayInvoke-{api_id}',
             Action='lambda:InvokeFunction',
             Principal='apigateway.amazonaws.com',
-            SourceArn=f"arn:aws:execute-api:{AWS_REGION}:{AWS_ACCOUNT_ID}:{api_id}/*/*"
+            SourceArn=f"arn:aws:execute-api:{config['region']}:{config['account_id']}:{api_id}/*/*"
         )
-        print(f"✓ Granted new API Gateway invocation permission")
+        print(f"✓ Granted API Gateway invocation permission")
     except lambda_client.exceptions.ResourceConflictException:
-        print(f"⚠ Permission already exists (conflict)")
+        print(f"⚠ Permission already exists")
     
     return api_endpoint
 
@@ -342,6 +579,8 @@ def configure_s3_trigger(function_arn: str):
     Configures S3 to trigger Lambda on timeline file uploads
     """
     
+    prefix = load_config()['project_prefix']
+    
     print("\n=== Configuring S3 Trigger ===\n")
     
     bucket_name = 'lol-training-matches-150k'
@@ -349,7 +588,8 @@ def configure_s3_trigger(function_arn: str):
     # Grant S3 permission to invoke Lambda
     try:
         lambda_client.add_permission(
-            FunctionName=f'{PROJECT_PREFIX}-event-processor',
+            FunctionName=f'{prefix}-event-processor',
+            Qualifier=LIVE_ALIAS,
             StatementId='AllowS3Invoke',
             Action='lambda:InvokeFunction',
             Principal='s3.amazonaws.com',
@@ -360,26 +600,40 @@ def configure_s3_trigger(function_arn: str):
         print(f"⚠ Permission already exists")
     
     # Configure S3 notification
-    s3 = boto3.client('s3')
-    
-    notification_config = {
-        'LambdaFunctionConfigurations': [
-            {
-                'Id': f'{PROJECT_PREFIX}-timeline-upload',
-                'LambdaFunctionArn': function_arn,
-                'Events': ['s3:ObjectCreated:*'],
-                'Filter': {
-                    'Key': {
-                        'FilterRules': [
-                            {'Name': 'suffix', 'Value': 'timeline-data.json'}
-                        ]
-                    }
-                }
+    trigger = {
+        'Id': f'{prefix}-timeline-upload',
+        'LambdaFunctionArn': function_arn,
+        'Events': ['s3:ObjectCreated:*'],
+        'Filter': {
+            'Key': {
+                'FilterRules': [
+                    {'Name': 'suffix', 'Value': 'timeline-data.json'}
+                ]
             }
-        ]
+        }
     }
     
     try:
+        current = s3.get_bucket_notification_configuration(Bucket=bucket_name)
+        current.pop('ResponseMetadata', None)
+        
+        # Keep other triggers on the bucket; replace only ours, matched by Id
+        # or by target so an entry from an older deploy doesn't overlap it
+        lambda_configs = current.get('LambdaFunctionConfigurations', [])
+        ours = [
+            c for c in lambda_configs
+            if c.get('Id') == trigger['Id'] or c.get('LambdaFunctionArn') == function_arn
+        ]
+        others = [c for c in lambda_configs if c not in ours]
+        
+        if len(ours) == 1 and ours[0].get('Id') == trigger['Id'] \
+                and _normalize_trigger(ours[0]) == _normalize_trigger(trigger):
+            print(f"✓ S3 bucket notification already configured")
+            return
+        
+        notification_config = dict(current)
+        notification_config['LambdaFunctionConfigurations'] = others + [trigger]
+        
         s3.put_bucket_notification_configuration(
             Bucket=bucket_name,
             NotificationConfiguration=notification_config
@@ -392,6 +646,19 @@ def configure_s3_trigger(function_arn: str):
         print(f"  You may need to configure this manually in the AWS Console")
 
 
+def _normalize_trigger(trigger: dict) -> dict:
+    """
+    Comparable form of a Lambda notification; S3 echoes filter rule names
+    capitalized ('Suffix') regardless of how they were written
+    """
+    rules = trigger.get('Filter', {}).get('Key', {}).get('FilterRules', [])
+    return {
+        'LambdaFunctionArn': trigger.get('LambdaFunctionArn'),
+        'Events': sorted(trigger.get('Events', [])),
+        'FilterRules': sorted((r['Name'].lower(), r['Value']) for r in rules)
+    }
+
+
 def main():
     """
     Orchestrates Lambda deployment
@@ -414,7 +681,7 @@ def main():
     deployment_info = {
         'functions': deployed_functions,
         'api_endpoint': api_endpoint,
-        'deployed_at': str(boto3.client('sts').get_caller_identity())
+        'deployed_at': caller_identity()
     }
     
     # MODIFIED: Write the output file to the project root
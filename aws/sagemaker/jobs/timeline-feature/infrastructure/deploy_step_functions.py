@@ -6,20 +6,24 @@ Creates and deploys Step Functions state machine for batch processing
 import boto3
 import json
 
-stepfunctions = boto3.client('stepfunctions')
-lambda_client = boto3.client('lambda')
+from deploy_lambda_functions import BOTO_CONFIG, caller_identity, lambda_client, load_config, publish_live_alias
 
-# Load configurations
-with open('infrastructure_config.json', 'r') as f:
-    infra_config = json.load(f)
+stepfunctions = boto3.client('stepfunctions', config=BOTO_CONFIG)
 
-with open('lambda_deployment_info.json', 'r') as f:
-    lambda_info = json.load(f)
 
-PROJECT_PREFIX = infra_config['project_prefix']
-SFN_ROLE_ARN = infra_config['stepfunctions_role_arn']
-AWS_REGION = infra_config['region']
-AWS_ACCOUNT_ID = infra_config['account_id']
+def substitute_placeholders(node, placeholders: dict):
+    """
+    Walks the definition once, swapping values keyed by (field, placeholder)
+    """
+    if isinstance(node, dict):
+        return {
+            key: placeholders.get((key, value), value) if isinstance(value, str)
+            else substitute_placeholders(value, placeholders)
+            for key, value in node.items()
+        }
+    if isinstance(node, list):
+        return [substitute_placeholders(item, placeholders) for item in node]
+    return node
 
 
 def create_state_machine():
@@ -27,45 +31,33 @@ def create_state_machine():
     Creates Step Functions state machine
     """
     
+    infra_config = load_config()
+    prefix = infra_config['project_prefix']
+    
     print("\n=== Creating Step Functions State Machine ===\n")
     
-    state_machine_name = f'{PROJECT_PREFIX}-batch-processor'
+    state_machine_name = f'{prefix}-batch-processor'
     
     # Load state machine definition
     with open('step_functions_definition.json', 'r') as f:
         definition = json.load(f)
     
-    # Replace placeholders with actual ARNs
-    definition_str = json.dumps(definition)
-    definition_str = definition_str.replace(
-        '"FunctionName": "timeline-event-processor"',
-        f'"FunctionName": "{PROJECT_PREFIX}-event-processor"'
-    )
-    definition_str = definition_str.replace(
-        '"FunctionName": "bedrock-summary-generator"',
-        f'"FunctionName": "{PROJECT_PREFIX}-summary-generator"'
-    )
-    definition_str = definition_str.replace(
-        '"TableName": "lol-timeline-events"',
-        f'"TableName": "{PROJECT_PREFIX}-timeline-events"'
-    )
-    definition_str = definition_str.replace(
-        '"TableName": "lol-player-timeline-metadata"',
-        f'"TableName": "{PROJECT_PREFIX}-player-timeline-metadata"'
-    )
-    definition_str = definition_str.replace(
-        '"TopicArn": "arn:aws:sns:us-west-2:768394660366:timeline-processing-complete"',
-        f'"TopicArn": "{infra_config["sns_topic_arn"]}"'
-    )
-    
-    definition = json.loads(definition_str)
+    # Replace placeholders with actual ARNs in one pass over the definition
+    placeholders = {
+        ('FunctionName', 'timeline-event-processor'): f'{prefix}-event-processor',
+        ('FunctionName', 'bedrock-summary-generator'): f'{prefix}-summary-generator',
+        ('TableName', 'lol-timeline-events'): f'{prefix}-timeline-events',
+        ('TableName', 'lol-player-timeline-metadata'): f'{prefix}-player-timeline-metadata',
+        ('TopicArn', 'arn:aws:sns:us-west-2:768394660366:timeline-processing-complete'): infra_config['sns_topic_arn']
+    }
+    definition_str = json.dumps(substitute_placeholders(definition, placeholders))
     
     try:
         # Try to create new state machine
         response = stepfunctions.create_state_machine(
             name=state_machine_name,
-            definition=json.dumps(definition),
-            roleArn=SFN_ROLE_ARN,
+            definition=definition_str,
+            roleArn=infra_config['stepfunctions_role_arn'],
             type='STANDARD',
             tags=[
                 {'key': 'Project', 'value': 'LOL-Coach'},
@@ -79,12 +71,12 @@ def create_state_machine():
         
     except stepfunctions.exceptions.StateMachineAlreadyExists:
         # Update existing state machine
-        state_machine_arn = f"arn:aws:states:{AWS_REGION}:{AWS_ACCOUNT_ID}:stateMachine:{state_machine_name}"
+        state_machine_arn = f"arn:aws:states:{infra_config['region']}:{infra_config['account_id']}:stateMachine:{state_machine_name}"
         
         response = stepfunctions.update_state_machine(
             stateMachineArn=state_machine_arn,
-            definition=json.dumps(definition),
-            roleArn=SFN_ROLE_ARN
+            definition=definition_str,
+            roleArn=infra_config['stepfunctions_role_arn']
         )
         
         print(f"✓ Updated existing state machine: {state_machine_name}")
@@ -100,18 +92,26 @@ def update_api_lambda_with_sfn_arn(state_machine_arn: str):
     
     print("\n=== Updating API Lambda Configuration ===\n")
     
-    function_name = f'{PROJECT_PREFIX}-api-handler'
+    function_name = f"{load_config()['project_prefix']}-api-handler"
     
+    # Merge into the existing variables rather than replacing them, and skip
+    # the update (and the publish) when the ARN is already set
+    current = lambda_client.get_function_configuration(FunctionName=function_name)
+    variables = dict((current.get('Environment') or {}).get('Variables', {}))
+    if variables.get('STEP_FUNCTIONS_ARN') == state_machine_arn:
+        print(f"✓ {function_name} already has the Step Functions ARN")
+        return
+    
+    variables['STEP_FUNCTIONS_ARN'] = state_machine_arn
     lambda_client.update_function_configuration(
         FunctionName=function_name,
-        Environment={
-            'Variables': {
-                'STEP_FUNCTIONS_ARN': state_machine_arn
-            }
-        }
+        Environment={'Variables': variables}
     )
     
     print(f"✓ Updated {function_name} with Step Functions ARN")
+    
+    # API Gateway invokes the live alias, so publish the new configuration
+    publish_live_alias(function_name)
 
 
 def main():
@@ -132,8 +132,8 @@ def main():
     # Save deployment info
     deployment_info = {
         'state_machine_arn': state_machine_arn,
-        'state_machine_name': f'{PROJECT_PREFIX}-batch-processor',
-        'deployed_at': boto3.client('sts').get_caller_identity()
+        'state_machine_name': f"{load_config()['project_prefix']}-batch-processor",
+        'deployed_at': caller_identity()
     }
     
     with open('stepfunctions_deployment_info.json', 'w') as f:
@@ -2,7 +2,8 @@
 DynamoDB table definitions for timeline feature caching
 """
 import boto3
-import time
+from botocore.config import Config
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
 TIMELINE_EVENTS_TABLE = {
     'TableName': 'lol-timeline-events',
@@ -15,7 +16,8 @@ TIMELINE_EVENTS_TABLE = {
         {'AttributeName': 'event_id', 'AttributeType': 'S'},
         {'AttributeName': 'puuid', 'AttributeType': 'S'},
         {'AttributeName': 'timestamp_minutes', 'AttributeType': 'N'},
-        {'AttributeName': 'impact_score', 'AttributeType': 'N'}
+        {'AttributeName': 'impact_score', 'AttributeType': 'N'},
+        {'AttributeName': 'match_puuid', 'AttributeType': 'S'}  # match_id#puuid
     ],
     'GlobalSecondaryIndexes': [
         {
@@ -35,6 +37,15 @@ TIMELINE_EVENTS_TABLE = {
             ],
             'Projection': {'ProjectionType': 'ALL'},
             # ProvisionedThroughput removed
+        },
+        {
+            # One player's events in a match, without filtering the others out
+            'IndexName': 'match-puuid-impact-index',
+            'KeySchema': [
+                {'AttributeName': 'match_puuid', 'KeyType': 'HASH'},
+                {'AttributeName': 'impact_score', 'KeyType': 'RANGE'}
+            ],
+            'Projection': {'ProjectionType': 'ALL'}
         }
     ],
     'BillingMode': 'PAY_PER_REQUEST',
@@ -82,6 +93,7 @@ USER_QUESTIONS_TABLE = {
         {'AttributeName': 'question_id', 'AttributeType': 'S'},
         {'AttributeName': 'event_id', 'AttributeType': 'S'},
         {'AttributeName': 'puuid', 'AttributeType': 'S'},
+        {'AttributeName': 'event_puuid', 'AttributeType': 'S'},  # event_id#puuid
     ],
     'GlobalSecondaryIndexes': [
         {
@@ -99,6 +111,14 @@ USER_QUESTIONS_TABLE = {
             ],
             'Projection': {'ProjectionType': 'ALL'},
             # ProvisionedThroughput removed
+        },
+        {
+            # Per-player question count for an event (rate limiting)
+            'IndexName': 'event-puuid-index',
+            'KeySchema': [
+                {'AttributeName': 'event_puuid', 'KeyType': 'HASH'}
+            ],
+            'Projection': {'ProjectionType': 'KEYS_ONLY'}
         }
     ],
     # TimeToLiveSpecification removed from create_table definition
@@ -138,13 +158,32 @@ PLAYER_TIMELINE_METADATA_TABLE = {
     ]
 }
 
+# Read by process_new_player.py in us-west-2, so it is created by
+# deploy_infrastructure.py rather than the us-east-1 script below
+RIOT_PUUID_CACHE_TABLE = {
+    'TableName': 'riot-puuid-cache',
+    'KeySchema': [
+        {'AttributeName': 'riot_id', 'KeyType': 'HASH'}  # game_name#tagline
+    ],
+    'AttributeDefinitions': [
+        {'AttributeName': 'riot_id', 'AttributeType': 'S'}
+    ],
+    'BillingMode': 'PAY_PER_REQUEST',
+    'Tags': [
+        {'Key': 'Project', 'Value': 'LOL-Coach'},
+        {'Key': 'Component', 'Value': 'PUUID-Cache'}
+    ]
+}
+
 # --- Create Tables Script (Corrected) ---
 
 def create_dynamodb_tables():
     """
     Creates all required DynamoDB tables and applies TTL settings.
     """
-    dynamodb = boto3.client('dynamodb', region_name='us-east-1')
+    dynamodb = boto3.client('dynamodb', region_name='us-east-1', config=Config(
+        retries={'mode': 'adaptive', 'max_attempts': 10}
+    ))
     waiter = dynamodb.get_waiter('table_exists')
 
     tables = [
@@ -160,46 +199,63 @@ def create_dynamodb_tables():
         'lol-timeline-user-questions': 'ttl'
     }
 
+    def wait_for_table(table_name):
+        waiter.wait(
+            TableName=table_name,
+            WaiterConfig={'Delay': 2, 'MaxAttempts': 60}
+        )
+        print(f"✓ Table {table_name} created successfully")
+
+    def apply_ttl(table_name):
+        try:
+            dynamodb.update_time_to_live(
+                TableName=table_name,
+                TimeToLiveSpecification={
+                    'Enabled': True,
+                    'AttributeName': ttl_settings[table_name]
+                }
+            )
+            print(f"✓ TTL enabled for {table_name}")
+        except Exception as ttl_e:
+            print(f"✗ Error updating TTL for {table_name}: {str(ttl_e)}")
+
+    # Pass 1: issue every create_table up front so the tables provision together
+    created = []
+    ready = []
     for table_config in tables:
         table_name = table_config['TableName']
         try:
             print(f"Creating table: {table_name}")
-            dynamodb.create_table(**table_config)
-            print(f"Waiting for {table_name} to become active...")
-            waiter.wait(TableName=table_name)
-            print(f"✓ Table {table_name} created successfully")
-
-            # After table is active, check if it needs TTL
-            if table_name in ttl_settings:
-                print(f"Applying TTL settings to {table_name}...")
-                dynamodb.update_time_to_live(
-                    TableName=table_name,
-                    TimeToLiveSpecification={
-                        'Enabled': True,
-                        'AttributeName': ttl_settings[table_name]
-                    }
-                )
-                print(f"✓ TTL enabled for {table_name}")
-
+            response = dynamodb.create_table(**table_config)
+            # Only poll tables that didn't come back ACTIVE already
+            if response['TableDescription']['TableStatus'] == 'ACTIVE':
+                ready.append(table_name)
+            else:
+                created.append(table_name)
         except dynamodb.exceptions.ResourceInUseException:
             print(f"⚠ Table {table_name} already exists")
-            # Check if TTL needs to be applied to existing table
-            try:
-                if table_name in ttl_settings:
-                    print(f"Verifying/Applying TTL settings to existing table {table_name}...")
-                    dynamodb.update_time_to_live(
-                        TableName=table_name,
-                        TimeToLiveSpecification={
-                            'Enabled': True,
-                            'AttributeName': ttl_settings[table_name]
-                        }
-                    )
-                    print(f"✓ TTL verified/enabled for {table_name}")
-            except Exception as ttl_e:
-                 print(f"✗ Error updating TTL for existing table {table_name}: {str(ttl_e)}")
-
+            ready.append(table_name)
         except Exception as e:
             print(f"✗ Error creating {table_name}: {str(e)}")
 
+    with ThreadPoolExecutor(max_workers=len(tables)) as executor:
+        # Pass 2: wait on the new tables concurrently, so the total wait is the
+        # slowest table rather than the sum
+        if created:
+            print(f"Waiting for {len(created)} tables to become active...")
+            futures = {executor.submit(wait_for_table, name): name for name in created}
+            for future in as_completed(futures):
+                try:
+                    future.result()
+                    ready.append(futures[future])
+                except Exception as e:
+                    print(f"✗ Error creating {futures[future]}: {str(e)}")
+
+        # Pass 3: TTL only applies once a table is active
+        ttl_tables = [name for name in ready if name in ttl_settings]
+        if ttl_tables:
+            print(f"Applying TTL settings to {', '.join(ttl_tables)}...")
+            list(executor.map(apply_ttl, ttl_tables))
+
 if __name__ == "__main__":
-    create_dynamodb_tables()
\ No newline at end of file
+    create_dynamodb_tables()
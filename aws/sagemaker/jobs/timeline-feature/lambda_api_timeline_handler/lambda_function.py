@@ -7,14 +7,30 @@ WELCOME TO THE API ROUTE NEXUS!!!!
 
 import json
 import boto3
+from array import array
 import os  
+import threading
+import time
+from collections import OrderedDict
 from datetime import datetime
 from decimal import Decimal
 from typing import Dict, List
 from boto3.dynamodb.conditions import Key, Attr
-
-dynamodb = boto3.resource('dynamodb')
-bedrock_runtime = boto3.client('bedrock-runtime', region_name='us-west-2')
+from botocore.config import Config
+from botocore.exceptions import ClientError
+from concurrent.futures import ThreadPoolExecutor
+
+# Built once per container so warm invocations reuse the clients and their
+# keep-alive connections
+BOTO_CONFIG = Config(
+    max_pool_connections=50,
+    retries={'mode': 'adaptive', 'max_attempts': 3},
+    tcp_keepalive=True
+)
+
+dynamodb = boto3.resource('dynamodb', config=BOTO_CONFIG)
+bedrock_runtime = boto3.client('bedrock-runtime', region_name='us-west-2', config=BOTO_CONFIG)
+stepfunctions = boto3.client('stepfunctions', config=BOTO_CONFIG)
 
 try:
     EVENTS_TABLE_NAME = os.environ['EVENTS_TABLE_NAME']
@@ -36,18 +52,63 @@ except KeyError as e:
     metadata_table = dynamodb.Table('placeholder-metadata')
 # --------------------------------------------------------
 
+# Shared across warm invocations for overlapping independent reads
+_pool = ThreadPoolExecutor(max_workers=8)
+
+# Events are immutable once processed, so warm containers keep hot ones
+# in memory (LRU, bounded by size and age)
+EVENT_CACHE_SIZE = 1024
+EVENT_CACHE_TTL = 3600  # seconds
+_event_cache = OrderedDict()
+_event_cache_lock = threading.Lock()
+
 # Bedrock configuration
 BEDROCK_MODEL_ID = 'anthropic.claude-3-haiku-20240307-v1:0'
 
+# Bedrock prompt caching: only these model families accept cachePoint blocks
+# (anything else rejects the request), so the markers are gated on the model
+PROMPT_CACHE_MODELS = (
+    'anthropic.claude-3-5-haiku',
+    'anthropic.claude-3-7-sonnet',
+    'anthropic.claude-sonnet-4',
+    'anthropic.claude-opus-4',
+    'amazon.nova'
+)
+PROMPT_CACHING = any(model in BEDROCK_MODEL_ID for model in PROMPT_CACHE_MODELS)
+CACHE_POINT = {'cachePoint': {'type': 'default'}}
+
+QA_SYSTEM_PROMPT = """You are an expert League of Legends coach answering a player's question about a specific moment in their ranked match.
+
+Provide a helpful, specific answer in 2-3 sentences. Focus on:
+1. Directly answering their question
+2. Providing ONE actionable tip they can apply
+
+Be conversational but professional. Under 100 words."""
+
+# Semantic Q&A cache: paraphrased questions about the same event reuse
+# an earlier answer instead of regenerating it
+EMBEDDING_MODEL_ID = 'amazon.titan-embed-text-v2:0'
+SEMANTIC_CACHE_THRESHOLD = 0.92
+
 
 class DecimalEncoder(json.JSONEncoder):
     """Helper to convert DynamoDB Decimals to JSON"""
     def default(self, obj):
         if isinstance(obj, Decimal):
-            return float(obj)
+            return int(obj) if obj == obj.to_integral_value() else float(obj)
         return super(DecimalEncoder, self).default(obj)
 
 
+def as_map(value) -> Dict:
+    """
+    event_details/context are stored as native Maps; older items still
+    hold them as JSON strings
+    """
+    if isinstance(value, str):
+        return json.loads(value)
+    return value or {}
+
+
 def lambda_handler(event, context):
     """
     Routes API requests to appropriate handlers
@@ -119,17 +180,11 @@ def get_timeline_events(event):
     
     print(f"Fetching events for match {match_id}, player {puuid}")
     
-    # Query events
-    response = events_table.query(
-        IndexName='match-impact-index',
-        KeyConditionExpression=Key('match_id').eq(match_id),
-        FilterExpression=Attr('puuid').eq(puuid),
-        ScanIndexForward=False  # Sort by impact score descending
-    )
+    events = query_player_events(match_id, puuid)
     
-    events = response.get('Items', [])
+    # Get cached summaries in one batched read instead of one get per event
+    summary_map = batch_get_summaries([e['event_id'] for e in events])
     
-    # Get cached summaries
     event_data = []
     for event_item in events:
         event_obj = {
@@ -138,23 +193,15 @@ def get_timeline_events(event):
             'event_type': event_item['event_type'],
             'impact_score': int(event_item['impact_score']),
             'game_state': event_item.get('game_state', 'mid'),
-            'event_details': json.loads(event_item.get('event_details', '{}')),
-            'context': json.loads(event_item.get('context', '{}')),
+            'event_details': as_map(event_item.get('event_details')),
+            'context': as_map(event_item.get('context')),
             'has_summary': False,
             'summary': None
         }
         
-        # Check for cached summary
-        summary_response = summaries_table.get_item(
-            Key={
-                'event_id': event_item['event_id'],
-                'summary_type': 'basic'
-            }
-        )
-        
-        if 'Item' in summary_response:
+        if event_item['event_id'] in summary_map:
             event_obj['has_summary'] = True
-            event_obj['summary'] = summary_response['Item'].get('summary_text')
+            event_obj['summary'] = summary_map[event_item['event_id']]
         
         event_data.append(event_obj)
     
@@ -166,6 +213,96 @@ def get_timeline_events(event):
     })
 
 
+def get_event_item(match_id: str, event_id: str):
+    """
+    Read-through cache over events_table.get_item
+    Returns the event item, or None if it doesn't exist
+    """
+    key = (match_id, event_id)
+    now = time.monotonic()
+    
+    with _event_cache_lock:
+        cached = _event_cache.get(key)
+        if cached and cached[0] > now:
+            _event_cache.move_to_end(key)
+            return cached[1]
+    
+    item = events_table.get_item(
+        Key={'match_id': match_id, 'event_id': event_id}
+    ).get('Item')
+    
+    # Misses aren't cached; the event may just not be processed yet
+    if item:
+        with _event_cache_lock:
+            _event_cache[key] = (now + EVENT_CACHE_TTL, item)
+            _event_cache.move_to_end(key)
+            while len(_event_cache) > EVENT_CACHE_SIZE:
+                _event_cache.popitem(last=False)
+    
+    return item
+
+
+def query_player_events(match_id: str, puuid: str) -> List[Dict]:
+    """
+    Returns one player's events for a match, highest impact first
+    """
+    
+    # The composite key reads only this player's events instead of reading
+    # the whole match and filtering
+    try:
+        response = events_table.query(
+            IndexName='match-puuid-impact-index',
+            KeyConditionExpression=Key('match_puuid').eq(f"{match_id}#{puuid}"),
+            ScanIndexForward=False  # Sort by impact score descending
+        )
+        if response.get('Items'):
+            return response['Items']
+    except ClientError as e:
+        # Index not created/backfilled yet on this table
+        print(f"match-puuid-impact-index unavailable: {str(e)}")
+    
+    # Events written before match_puuid existed are only on the match index
+    response = events_table.query(
+        IndexName='match-impact-index',
+        KeyConditionExpression=Key('match_id').eq(match_id),
+        FilterExpression=Attr('puuid').eq(puuid),
+        ScanIndexForward=False
+    )
+    return response.get('Items', [])
+
+
+def batch_get_summaries(event_ids: List[str]) -> Dict[str, str]:
+    """
+    Fetches cached basic summaries for the given events; returns {event_id: summary_text}
+    """
+    
+    summary_map = {}
+    table_name = summaries_table.name
+    
+    # BatchGetItem takes at most 100 keys per request
+    for i in range(0, len(event_ids), 100):
+        request_items = {
+            table_name: {
+                'Keys': [{'event_id': event_id, 'summary_type': 'basic'} for event_id in event_ids[i:i + 100]],
+                'ProjectionExpression': 'event_id, summary_text'
+            }
+        }
+        
+        delay = 0.05
+        while request_items:
+            response = dynamodb.batch_get_item(RequestItems=request_items)
+            for item in response.get('Responses', {}).get(table_name, []):
+                summary_map[item['event_id']] = item.get('summary_text')
+            
+            # Throttled keys come back unprocessed; retry them with backoff
+            request_items = response.get('UnprocessedKeys') or {}
+            if request_items:
+                time.sleep(delay)
+                delay = min(delay * 2, 1)
+    
+    return summary_map
+
+
 def get_event_summary(event):
     """
     POST /timeline/events/summary
@@ -188,15 +325,21 @@ def get_event_summary(event):
     print(f"Getting summary for event {event_id}")
     
     # Check cache first
-    cache_response = summaries_table.get_item(
+    # Read the event alongside the cache check so a miss doesn't pay a
+    # second round trip; on a hit the speculative read is discarded
+    cache_future = _pool.submit(
+        summaries_table.get_item,
         Key={
             'event_id': event_id,
             'summary_type': 'basic'
         }
     )
+    event_future = _pool.submit(get_event_item, match_id, event_id)
+    cache_response = cache_future.result()
     
     if 'Item' in cache_response:
         print("Cache hit")
+        event_future.cancel()
         return cors_response(200, {
             'event_id': event_id,
             'summary': cache_response['Item']['summary_text'],
@@ -208,15 +351,11 @@ def get_event_summary(event):
     print("Cache miss - generating new summary")
     
     # Get event details
-    event_response = events_table.get_item(
-        Key={'match_id': match_id, 'event_id': event_id}
-    )
+    event_data = event_future.result()
     
-    if 'Item' not in event_response:
+    if not event_data:
         return cors_response(404, {'error': 'Event not found'})
     
-    event_data = event_response['Item']
-    
     try:
         from lambda_bedrock_summary_generator.lambda_function import BedrockSummaryGenerator
     except ImportError:
@@ -271,15 +410,13 @@ def answer_question(event):
             'error': 'event_id, match_id, puuid, and question required'
         })
     
-    # Rate limiting: check question count
-    question_count_response = questions_table.query(
-        IndexName='event-questions-index',
-        KeyConditionExpression=Key('event_id').eq(event_id),
-        FilterExpression=Attr('puuid').eq(puuid)
-    )
+    # The rate-limit count and the event read are independent; run them together
+    event_future = _pool.submit(get_event_item, match_id, event_id)
     
-    question_count = len(question_count_response.get('Items', []))
+    # Rate limiting: check question count
+    question_count = count_questions(event_id, puuid)
     if question_count >= 5:
+        event_future.cancel()
         return cors_response(429, {
             'error': 'Maximum 5 questions per event reached',
             'limit': 5,
@@ -288,74 +425,190 @@ def answer_question(event):
     
     print(f"Answering question for event {event_id}: {question}")
     
+    # Only embed once the request is within its limit; overlaps the event read
+    embedding_future = _pool.submit(embed_question, question)
+    
     # Get event details
-    event_response = events_table.get_item(
-        Key={'match_id': match_id, 'event_id': event_id}
-    )
+    event_data = event_future.result()
     
-    if 'Item' not in event_response:
+    if not event_data:
+        embedding_future.cancel()
         return cors_response(404, {'error': 'Event not found'})
     
-    event_data = event_response['Item']
-    
-    # Build prompt for question answering
-    prompt = build_qa_prompt(event_data, question, match_context)
-    
-    # Call Bedrock
-    request_body = {
-        "messages": [
-            {
-                "role": "user",
-                "content": prompt
-            }
-        ],
-        "max_tokens": 250,
-        "temperature": 0.7
-    }
+    # Reuse an answer to a near-identical question this player asked about the event
+    embedding = embedding_future.result()
+    answer = find_cached_answer(event_id, match_id, puuid, embedding) if embedding else None
+    cached = answer is not None
     
-    try:
-        response = bedrock_runtime.invoke_model(
-            modelId=BEDROCK_MODEL_ID,
-            body=json.dumps(request_body),
-            contentType='application/json',
-            accept='application/json'
-        )
-        
-        response_body = json.loads(response['body'].read())
+    if cached:
+        print("Semantic cache hit")
+    else:
+        # Build prompt for question answering
+        system_blocks, user_blocks = build_qa_prompt(event_data, question, match_context)
         
-        # Extract from OpenAI response format
-        if 'choices' in response_body and len(response_body['choices']) > 0:
-            answer = response_body['choices'][0]['message']['content']
-        else:
-            answer = "I apologize, but I couldn't generate an answer at this time."
-            
-    except Exception as e:
-        print(f"Bedrock error: {str(e)}")
-        answer = "I apologize, but I couldn't generate an answer at this time. Please try again."
+        # Call Bedrock
+        try:
+            answer = generate_answer(system_blocks, user_blocks)
+            if not answer:
+                answer = "I apologize, but I couldn't generate an answer at this time."
+                embedding = None
+                
+        except Exception as e:
+            print(f"Bedrock error: {str(e)}")
+            answer = "I apologize, but I couldn't generate an answer at this time. Please try again."
+            embedding = None
     
     # Save question and answer
     question_id = f"{event_id}_{int(datetime.utcnow().timestamp())}"
     from datetime import timedelta
     ttl = int((datetime.utcnow() + timedelta(days=30)).timestamp())
     
-    questions_table.put_item(Item={
+    # Saved while the response is built; it must finish before returning since
+    # the environment freezes once the handler returns
+    question_item = {
         'question_id': question_id,
         'event_id': event_id,
         'match_id': match_id,
         'puuid': puuid,
+        'event_puuid': f"{event_id}#{puuid}",
         'question': question,
         'answer': answer,
         'asked_at': int(datetime.utcnow().timestamp()),
         'ttl': ttl
-    })
+    }
+    # Only real answers are offered to the semantic cache, never the fallback text
+    if embedding and not cached:
+        question_item['embedding'] = embedding
+    save_future = _pool.submit(questions_table.put_item, Item=question_item)
     
-    return cors_response(200, {
+    response = cors_response(200, {
         'event_id': event_id,
         'question': question,
         'answer': answer,
+        'cached': cached,
         'question_count': question_count + 1,
         'remaining_questions': 4 - question_count
     })
+    
+    save_future.result()
+    return response
+
+
+def embed_question(question: str):
+    """
+    Titan embedding of the question as float32 bytes, or None on failure
+    Vectors are normalized, so cosine similarity is a plain dot product
+    """
+    try:
+        response = bedrock_runtime.invoke_model(
+            modelId=EMBEDDING_MODEL_ID,
+            body=json.dumps({'inputText': question, 'normalize': True}),
+            contentType='application/json',
+            accept='application/json'
+        )
+        vector = json.loads(response['body'].read())['embedding']
+        return array('f', vector).tobytes()
+    except Exception as e:
+        print(f"Embedding error: {str(e)}")
+        return None
+
+
+def find_cached_answer(event_id: str, match_id: str, puuid: str, embedding: bytes):
+    """
+    Answer to the most similar earlier question the player asked about the
+    event in this match, if its cosine similarity clears
+    SEMANTIC_CACHE_THRESHOLD. Answers quote the asker's own stats, so they
+    are never shared across players or matches.
+    """
+    target = array('f')
+    target.frombytes(embedding)
+    
+    query = {
+        'IndexName': 'event-questions-index',
+        'KeyConditionExpression': Key('event_id').eq(event_id),
+        'FilterExpression': (
+            Attr('embedding').exists()
+            & Attr('puuid').eq(puuid)
+            & Attr('match_id').eq(match_id)
+        ),
+        'ProjectionExpression': 'answer, embedding'
+    }
+    try:
+        response = questions_table.query(**query)
+        items = response.get('Items', [])
+        while 'LastEvaluatedKey' in response:
+            response = questions_table.query(ExclusiveStartKey=response['LastEvaluatedKey'], **query)
+            items.extend(response.get('Items', []))
+    except ClientError as e:
+        # A failed lookup just means generating the answer
+        print(f"Semantic cache lookup failed: {str(e)}")
+        return None
+    
+    best_score, best_answer = SEMANTIC_CACHE_THRESHOLD, None
+    for item in items:
+        candidate = array('f')
+        candidate.frombytes(bytes(item['embedding']))
+        if len(candidate) != len(target):
+            continue
+        score = sum(a * b for a, b in zip(target, candidate))
+        if score > best_score:
+            best_score, best_answer = score, item['answer']
+    
+    return best_answer
+
+
+def generate_answer(system_blocks: List[Dict], user_blocks: List[Dict]) -> str:
+    """
+    Generates an answer with ConverseStream, assembling the text chunks
+    as they arrive
+    """
+    
+    response = bedrock_runtime.converse_stream(
+        modelId=BEDROCK_MODEL_ID,
+        system=system_blocks,
+        messages=[{'role': 'user', 'content': user_blocks}],
+        inferenceConfig={'maxTokens': 250, 'temperature': 0.7}
+    )
+    
+    parts = []
+    for stream_event in response['stream']:
+        text = stream_event.get('contentBlockDelta', {}).get('delta', {}).get('text')
+        if text:
+            parts.append(text)
+    
+    return ''.join(parts)
+
+
+def count_questions(event_id: str, puuid: str) -> int:
+    """
+    Number of questions the player has asked about the event
+    """
+    
+    # COUNT returns only the tally; pages are summed in case it ever spans more than one
+    try:
+        query = {
+            'IndexName': 'event-puuid-index',
+            'KeyConditionExpression': Key('event_puuid').eq(f"{event_id}#{puuid}"),
+            'Select': 'COUNT'
+        }
+        response = questions_table.query(**query)
+    except ClientError as e:
+        # Index not created/backfilled yet; filter the event's questions instead
+        print(f"event-puuid-index unavailable: {str(e)}")
+        query = {
+            'IndexName': 'event-questions-index',
+            'KeyConditionExpression': Key('event_id').eq(event_id),
+            'FilterExpression': Attr('puuid').eq(puuid),
+            'Select': 'COUNT'
+        }
+        response = questions_table.query(**query)
+    
+    count = response['Count']
+    while 'LastEvaluatedKey' in response:
+        response = questions_table.query(ExclusiveStartKey=response['LastEvaluatedKey'], **query)
+        count += response['Count']
+    
+    return count
 
 
 def get_player_matches(event):
@@ -413,7 +666,6 @@ def trigger_batch_processing(event):
         return cors_response(400, {'error': 'match_ids and puuid required'})
     
     # Trigger Step Functions
-    stepfunctions = boto3.client('stepfunctions')
     state_machine_arn = os.environ.get('STEP_FUNCTIONS_ARN')
     
     if not state_machine_arn:
@@ -443,17 +695,18 @@ def trigger_batch_processing(event):
         return cors_response(500, {'error': f'Failed to start batch processing: {str(e)}'})
 
 
-def build_qa_prompt(event: Dict, question: str, match_context: Dict) -> str:
+def build_qa_prompt(event: Dict, question: str, match_context: Dict):
     """
-    Builds prompt for question answering
+    Builds Converse system and user content blocks for question answering
+    The coaching instructions and the event description form a stable prefix
+    (cache points go after each); the request's match context and the
+    question come last so nothing caller-specific lands in the cached part
     """
     
-    event_details = json.loads(event.get('event_details', '{}'))
-    context = json.loads(event.get('context', '{}'))
+    event_details = as_map(event.get('event_details'))
+    context = as_map(event.get('context'))
     
-    prompt = f"""You are an expert League of Legends coach answering a player's question about a specific moment in their ranked match.
-
-**Event Context:**
+    event_text = f"""**Event Context:**
 - Type: {event['event_type']}
 - Time: {float(event['timestamp_minutes']):.1f} minutes
 - Game State: {event.get('game_state', 'mid')}
@@ -461,20 +714,21 @@ def build_qa_prompt(event: Dict, question: str, match_context: Dict) -> str:
 - Gold Difference: {context.get('gold_difference', 0)}g
 
 **Event Details:**
-{json.dumps(event_details, indent=2)}
+{json.dumps(event_details, indent=2, cls=DecimalEncoder)}"""
 
-**Match Context:**
+    question_text = f"""**Match Context:**
 {json.dumps(match_context, indent=2)}
 
-**Player Question:** {question}
+**Player Question:** {question}"""
 
-Provide a helpful, specific answer in 2-3 sentences. Focus on:
-1. Directly answering their question
-2. Providing ONE actionable tip they can apply
-
-Be conversational but professional. Under 100 words."""
-
-    return prompt
+    system_blocks = [{'text': QA_SYSTEM_PROMPT}]
+    user_blocks = [{'text': event_text}]
+    if PROMPT_CACHING:
+        system_blocks.append(CACHE_POINT)
+        user_blocks.append(CACHE_POINT)
+    user_blocks.append({'text': question_text})
+    
+    return system_blocks, user_blocks
 
 
 def cors_response(status_code: int, body: dict) -> dict:
@@ -95,8 +95,13 @@ class BedrockSummaryGenerator:
         impact = event['impact_score']
         game_state = event.get('game_state', 'mid')
         
-        event_details = json.loads(event.get('event_details', '{}'))
-        context = json.loads(event.get('context', '{}'))
+        # Native Maps on new items, JSON strings on older ones
+        event_details = event.get('event_details') or {}
+        context = event.get('context') or {}
+        if isinstance(event_details, str):
+            event_details = json.loads(event_details)
+        if isinstance(context, str):
+            context = json.loads(context)
         
         # Build context-aware prompt based on event type
         if event_type == 'KILL':
@@ -129,7 +134,7 @@ class BedrockSummaryGenerator:
         killer = details.get('killer', 'Unknown')
         victim = details.get('victim', 'Unknown')
         shutdown = details.get('shutdown_gold', 0)
-        gold_diff = context.get('gold_difference', 0)
+        gold_diff = int(context.get('gold_difference', 0))
         gold_state = context.get('gold_state', 'even')
         
         champion = player_ctx.get('champion', 'your champion')
@@ -191,7 +196,7 @@ Be direct and actionable. Under 80 words."""
         """
         objective = details.get('objective_type', 'OBJECTIVE')
         securing_team = details.get('securing_team', 'UNKNOWN')
-        gold_diff = context.get('gold_difference', 0)
+        gold_diff = int(context.get('gold_difference', 0))
         gold_state = context.get('gold_state', 'even')
         
         champion = player_ctx.get('champion', 'your champion')
@@ -238,7 +243,7 @@ Be constructive and actionable. Under 80 words."""
         player_kills = details.get('player_team_kills', 0)
         enemy_kills = details.get('enemy_team_kills', 0)
         duration = details.get('duration_seconds', 0)
-        gold_diff = context.get('gold_difference', 0)
+        gold_diff = int(context.get('gold_difference', 0))
         gold_state = context.get('gold_state', 'even')
         
         champion = player_ctx.get('champion', 'your champion')
@@ -269,7 +274,7 @@ Be direct and actionable. Under 80 words."""
         structure = details.get('structure_type', 'STRUCTURE')
         lane = details.get('lane', 'UNKNOWN')
         destroying_team = details.get('destroying_team', 'UNKNOWN')
-        gold_diff = context.get('gold_difference', 0)
+        gold_diff = int(context.get('gold_difference', 0))
         gold_state = context.get('gold_state', 'even')
         
         champion = player_ctx.get('champion', 'your champion')
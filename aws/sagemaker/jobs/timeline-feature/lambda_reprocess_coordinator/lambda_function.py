@@ -0,0 +1,109 @@
+"""
+Fans out timeline reprocessing to the event processor Lambda
+Invoked with a list of match IDs; runs in-region so each child invoke is a
+short round-trip
+"""
+
+import json
+import math
+import os
+import boto3
+from botocore.config import Config
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+INVOKE_WORKERS = 128
+
+# Pool sized for the invoke threads; adaptive retries absorb throttling
+lambda_client = boto3.client('lambda', config=Config(
+    max_pool_connections=INVOKE_WORKERS,
+    retries={'mode': 'adaptive', 'max_attempts': 10}
+))
+
+PROCESSOR_FUNCTION_NAME = os.environ.get('PROCESSOR_FUNCTION_NAME', 'lol-timeline-event-processor')
+BUCKET_NAME = os.environ.get('BUCKET_NAME', 'lol-training-matches-150k')
+
+# Lists longer than this are split across second-level coordinators
+MAX_DIRECT_FANOUT = 1000
+
+
+def invoke_async(function_name: str, payload: dict):
+    """Fire-and-forget invoke; Lambda queues the event and returns 202"""
+    lambda_client.invoke(
+        FunctionName=function_name,
+        InvocationType='Event',
+        Payload=json.dumps(payload)
+    )
+
+
+def s3_event(timeline_key: str) -> dict:
+    """Builds the S3 notification shape the event processor expects"""
+    return {
+        'Records': [{
+            's3': {
+                'bucket': {'name': BUCKET_NAME},
+                'object': {'key': timeline_key}
+            }
+        }]
+    }
+
+
+def fan_out(jobs: list) -> list:
+    """Runs (function_name, payload, label) invokes concurrently; returns failed labels"""
+    failed = []
+    with ThreadPoolExecutor(max_workers=min(INVOKE_WORKERS, max(1, len(jobs)))) as executor:
+        futures = {executor.submit(invoke_async, name, payload): label for name, payload, label in jobs}
+        for future in as_completed(futures):
+            try:
+                future.result()
+            except Exception as e:
+                print(f"Error invoking for {futures[future]}: {str(e)}")
+                failed.append(futures[future])
+    return failed
+
+
+def lambda_handler(event, context):
+    """
+    Expects {"match_ids": [...], "player_folder": "GAMENAME_TAGLINE"}
+    """
+
+    match_ids = event.get('match_ids', [])
+    player_folder = event.get('player_folder')
+
+    if not match_ids or not player_folder:
+        return {
+            'statusCode': 400,
+            'body': json.dumps({'error': 'match_ids and player_folder are required'})
+        }
+
+    print(f"Coordinating reprocessing of {len(match_ids)} matches for {player_folder}")
+
+    if len(match_ids) > MAX_DIRECT_FANOUT:
+        # Two-level tree: sqrt(N) child coordinators of sqrt(N) matches each
+        chunk_size = math.ceil(math.sqrt(len(match_ids)))
+        jobs = [
+            (context.function_name,
+             {'match_ids': match_ids[i:i + chunk_size], 'player_folder': player_folder},
+             f"chunk {i // chunk_size}")
+            for i in range(0, len(match_ids), chunk_size)
+        ]
+        kind = 'coordinators'
+    else:
+        jobs = [
+            (PROCESSOR_FUNCTION_NAME,
+             s3_event(f"raw-matches/{player_folder}/{match_id}/timeline-data.json"),
+             match_id)
+            for match_id in match_ids
+        ]
+        kind = 'processors'
+
+    failed = fan_out(jobs)
+    print(f"Invoked {len(jobs) - len(failed)}/{len(jobs)} {kind}")
+
+    return {
+        'statusCode': 200,
+        'body': json.dumps({
+            'invoked': len(jobs) - len(failed),
+            'invoke_type': kind,
+            'failed': failed
+        })
+    }
@@ -383,6 +383,13 @@ class TimelineEventExtractor:
         else:
             return 'late'
 
+def to_dynamo(value):
+    """
+    Converts a JSON-like value for storage as a DynamoDB Map
+    (the resource API rejects floats, so they become Decimals)
+    """
+    return json.loads(json.dumps(value), parse_float=Decimal)
+
 def lambda_handler(event, context):
     """
     Processes timeline data and extracts critical events
@@ -462,12 +469,14 @@ def lambda_handler(event, context):
                                 'match_id': match_id,
                                 'event_id': moment['event_id'],
                                 'puuid': target_puuid,
+                                'match_puuid': f"{match_id}#{target_puuid}",
                                 'timestamp_minutes': Decimal(str(moment['timestamp_minutes'])),
                                 'event_type': moment['event_type'],
                                 'impact_score': moment['impact_score'],
                                 'game_state': moment['game_state'],
-                                'event_details': json.dumps(moment['event_details']),
-                                'context': json.dumps(moment.get('context', {})),
+                                # Native Maps, so readers get dicts without a json.loads
+                                'event_details': to_dynamo(moment['event_details']),
+                                'context': to_dynamo(moment.get('context', {})),
                                 'created_at': int(datetime.utcnow().timestamp())
                             }
                             batch.put_item(Item=item)